@@ -0,0 +1,101 @@
+"""
+Precomputed aggregates behind the /admin/analytics endpoints.
+
+The numbers live in materialized views (migrations/0007), so a dashboard
+read is an index lookup on a few hundred rows instead of a scan of every
+booking. A background thread keeps them fresh: booking writes call
+`mark_analytics_dirty()`, and the thread refreshes at most once every
+ANALYTICS_REFRESH_DELAY seconds after a change, plus once every
+ANALYTICS_REFRESH_INTERVAL seconds regardless (item edits, clock drift).
+
+Views are refreshed CONCURRENTLY so readers never wait, and under an
+advisory lock so several workers do not refresh the same views at once.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from db import engine
+
+logger = logging.getLogger("fibo.analytics")
+
+ANALYTICS_REFRESH_DELAY = float(os.getenv("ANALYTICS_REFRESH_DELAY", "30"))
+ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "900"))
+
+ANALYTICS_VIEWS = ["analytics_item_demand", "analytics_category_stats", "analytics_loan_summary"]
+
+# Arbitrary key shared by every worker for pg_try_advisory_xact_lock
+REFRESH_LOCK_KEY = 4_815_162
+
+
+def refresh_views(connection):
+    """Refresh every analytics view; returns False if another worker is already at it."""
+    if not connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY}).scalar():
+        return False
+    for view in ANALYTICS_VIEWS:
+        connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+    return True
+
+
+class AnalyticsRefresher(threading.Thread):
+    def __init__(self, delay: float = ANALYTICS_REFRESH_DELAY, interval: float = ANALYTICS_REFRESH_INTERVAL):
+        super().__init__(name="analytics-refresher", daemon=True)
+        self.delay = delay
+        self.interval = interval
+        self._dirty = threading.Event()
+        self._stopping = threading.Event()
+
+    def mark_dirty(self):
+        self._dirty.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._dirty.set()
+
+    def run(self):
+        last_refresh = time.monotonic()
+        while not self._stopping.is_set():
+            changed = self._dirty.wait(timeout=max(0.0, self.interval - (time.monotonic() - last_refresh)))
+            if self._stopping.is_set():
+                break
+            if changed:
+                # Let a burst of bookings settle into one refresh
+                self._stopping.wait(self.delay)
+            self._dirty.clear()
+            try:
+                started = time.perf_counter()
+                with engine.begin() as connection:
+                    refreshed = refresh_views(connection)
+                if refreshed:
+                    logger.info("Refreshed analytics views in %.0f ms", (time.perf_counter() - started) * 1000)
+            except Exception:
+                logger.exception("Analytics refresh failed")
+            last_refresh = time.monotonic()
+
+
+# The running refresher, between start_analytics() and stop_analytics()
+_refresher = None
+
+
+def mark_analytics_dirty():
+    """Have the views refreshed soon; nothing to do when no refresher runs (scripts)."""
+    refresher = _refresher
+    if refresher is not None:
+        refresher.mark_dirty()
+
+
+def start_analytics():
+    global _refresher
+    _refresher = AnalyticsRefresher()
+    _refresher.start()
+
+
+def stop_analytics():
+    global _refresher
+    refresher, _refresher = _refresher, None
+    if refresher is not None:
+        refresher.stop()
+        refresher.join(timeout=10)
@@ -0,0 +1,138 @@
+"""
+HTTP load benchmark for a running FIBO Store API.
+
+Keeps `--concurrency` keep-alive connections busy for `--duration` seconds,
+spreading requests over the given paths, and reports requests per second and
+p50/p99 latency per path. Use `--output` to save the numbers and `--compare`
+to diff two saved runs, e.g. before and after a pool or threading change.
+All requests come from one address, so start the server with
+RATE_LIMIT_ENABLED=false unless the rate limiter is what you are measuring:
+
+    RATE_LIMIT_ENABLED=false uvicorn main:app --port 8000 &
+    python benchmarks/load_bench.py --path /items --path "/admin/bookings?limit=50" \
+        --concurrency 32 --duration 20 --output before.json
+    # ...apply the change, restart uvicorn...
+    python benchmarks/load_bench.py ... --output after.json
+    python benchmarks/load_bench.py --compare before.json after.json
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def worker(base_url, paths, deadline, offset, results, lock):
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.hostname, parts.port, timeout=30)
+    local = {path: {"latencies": [], "errors": 0} for path in paths}
+    n = offset
+    while time.perf_counter() < deadline:
+        path = paths[n % len(paths)]
+        n += 1
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            if response.status >= 400:
+                local[path]["errors"] += 1
+            else:
+                local[path]["latencies"].append(elapsed)
+        except (OSError, http.client.HTTPException):
+            local[path]["errors"] += 1
+            connection.close()
+            connection = connection_class(parts.hostname, parts.port, timeout=30)
+    connection.close()
+    with lock:
+        for path, stats in local.items():
+            results[path]["latencies"].extend(stats["latencies"])
+            results[path]["errors"] += stats["errors"]
+
+
+def run(base_url, paths, concurrency, duration):
+    results = {path: {"latencies": [], "errors": 0} for path in paths}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base_url, paths, deadline, i, results, lock))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    report = {"concurrency": concurrency, "duration": round(wall, 2), "paths": {}}
+    for path, stats in results.items():
+        latencies = stats["latencies"]
+        report["paths"][path] = {
+            "requests": len(latencies),
+            "errors": stats["errors"],
+            "rps": round(len(latencies) / wall, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'path':40} {'req':>8} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for path, stats in report["paths"].items():
+        print(f"{path[:40]:40} {stats['requests']:>8} {stats['errors']:>5} "
+              f"{stats['rps']:>9} {stats['p50_ms']:>9} {stats['p99_ms']:>9}")
+
+
+def compare(before_file, after_file):
+    with open(before_file) as f:
+        before = json.load(f)
+    with open(after_file) as f:
+        after = json.load(f)
+    print(f"{'path':40} {'metric':>12} {'before':>10} {'after':>10} {'change':>8}")
+    for path, new in after["paths"].items():
+        old = before["paths"].get(path)
+        if not old:
+            continue
+        # mixed_load.py reports also carry p95 and queries per request
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "mean_queries"):
+            if metric not in old or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            print(f"{path[:40]:40} {metric:>12} {old[metric]:>10} {new[metric]:>10} {change:>+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    report = run(args.url, args.paths or ["/items"], args.concurrency, args.duration)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,315 @@
+"""
+Mixed-traffic benchmark for the booking API.
+
+Drives a weighted mix of storefront, checkout and admin requests against a
+database seeded by seed.py and reports per operation: throughput, p50/p95/p99
+latency and SQL queries per request (from the X-Query-Count header). Each
+worker books carts, then approves and returns its own bookings, so the
+status transitions and restocks run under load too. Catalog reads send
+If-None-Match like a browser does.
+
+    python benchmarks/seed.py --database-url $BENCH_DATABASE_URL --scale medium
+    python benchmarks/mixed_load.py --database-url $BENCH_DATABASE_URL --start-server \
+        --concurrency 32 --duration 30 --output results/before.json
+    # ...change something...
+    python benchmarks/mixed_load.py ... --output results/after.json
+    python benchmarks/load_bench.py --compare results/before.json results/after.json
+
+--start-server runs uvicorn against that database with IMAGE_STORAGE=stub,
+so no image ever reaches Cloudinary. Runs are reproducible for a given
+--seed, scale and mix.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from PIL import Image
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from load_bench import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weights, roughly a semester-start day: mostly browsing, a steady
+# stream of checkouts, admins working through the queue
+DEFAULT_MIX = {
+    "GET /items": 30,
+    "GET /items?limit": 12,
+    "GET /items/search": 8,
+    "GET /my-bookings": 15,
+    "GET /admin/bookings": 8,
+    "POST /bookings": 15,
+    "PATCH /bookings/{id}/status": 10,
+    "POST /items": 2,
+}
+
+SEARCH_TERMS = ["motor", "sensor kit", "gear", "bench part", "voltage"]
+CATEGORIES = ["Motors", "Sensors", "Microcontrollers", "Power", "Tools"]
+
+
+def sample_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (40, 120, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def multipart(fields: dict, file_name: str, file_data: bytes):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image_file"; filename="{file_name}"\r\n'
+        f"Content-Type: image/png\r\n\r\n".encode() + file_data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Worker:
+    def __init__(self, n: int, base_url: str, dataset: dict, seed: int, image: bytes):
+        self.rng = random.Random(seed * 1000 + n)
+        self.parts = urlsplit(base_url)
+        self.dataset = dataset
+        self.image = image
+        self.etags = {}
+        # Bookings this worker created and their status, for the PATCH step
+        self.bookings = deque(maxlen=200)
+        self.connection = self.connect()
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.parts.scheme == "https" else http.client.HTTPConnection
+        return connection_class(self.parts.hostname, self.parts.port, timeout=30)
+
+    def random_email(self):
+        return f"bench-user-{self.rng.randint(1, self.dataset['users'])}@example.com"
+
+    def build(self, operation: str):
+        """Return (method, path, body, headers) for one request of `operation`."""
+        rng = self.rng
+        if operation == "GET /items":
+            return "GET", "/items", None, {}
+        if operation == "GET /items?limit":
+            return "GET", f"/items?limit=24&category={rng.choice(CATEGORIES)}&in_stock=true", None, {}
+        if operation == "GET /items/search":
+            return "GET", f"/items/search?q={rng.choice(SEARCH_TERMS).replace(' ', '+')}&spec=rpm>=300", None, {}
+        if operation == "GET /my-bookings":
+            return "GET", f"/my-bookings?email={self.random_email()}", None, {}
+        if operation == "GET /admin/bookings":
+            status = rng.choice(["", "&status=Pending", "&status=Approved"])
+            return "GET", f"/admin/bookings?limit=50{status}", None, {}
+        if operation == "POST /bookings":
+            pickup = date.today() + timedelta(days=rng.randint(0, 14))
+            cart = [
+                {"item_id": rng.randint(1, self.dataset["items"]), "quantity": rng.randint(1, 2)}
+                for _ in range(rng.randint(1, 4))
+            ]
+            body = {
+                "user_email": self.random_email(), "user_name": "Bench User",
+                "pickup_date": pickup.isoformat(),
+                "due_date": (pickup + timedelta(days=rng.randint(1, 14))).isoformat(),
+                "purpose": "Load test", "items": cart,
+            }
+            return "POST", "/bookings", json.dumps(body).encode(), {"Content-Type": "application/json"}
+        if operation == "PATCH /bookings/{id}/status":
+            if not self.bookings:
+                return None
+            booking_id, current = self.bookings.popleft()
+            target = {"Pending": rng.choice(["Approved", "Approved", "Approved", "Rejected"]), "Approved": "Returned"}[current]
+            if target == "Approved":
+                self.bookings.append((booking_id, "Approved"))
+            body = json.dumps({"status": target}).encode()
+            return "PATCH", f"/bookings/{booking_id}/status", body, {"Content-Type": "application/json"}
+        if operation == "POST /items":
+            body, content_type = multipart({
+                "name": f"Bench Upload {rng.randint(1, 10**6)}", "category": rng.choice(CATEGORIES),
+                "description": "Uploaded by mixed_load.py", "quantity": "10", "unit": "pcs",
+                "specifications": json.dumps({"voltage": "5V"}),
+            }, "bench.png", self.image)
+            return "POST", "/items", body, {"Content-Type": content_type}
+        raise ValueError(f"Unknown operation: {operation}")
+
+    def send(self, method, path, body, headers):
+        if method == "GET" and path in self.etags:
+            headers = {**headers, "If-None-Match": self.etags[path]}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = self.connect()
+            return None, None, None
+        if response.getheader("ETag"):
+            self.etags[path] = response.getheader("ETag")
+        return response.status, payload, response.getheader("X-Query-Count")
+
+    def run(self, operations, weights, deadline, results):
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            request = self.build(operation)
+            if request is None:
+                # Nothing to approve yet: book something first
+                operation = "POST /bookings"
+                request = self.build(operation)
+
+            started = time.perf_counter()
+            status, payload, queries = self.send(*request)
+            elapsed = time.perf_counter() - started
+
+            stats = results[operation]
+            # A sold-out cart (400) is a normal answer under load, not a failure
+            if status is None or status >= 500 or (status >= 400 and operation != "POST /bookings"):
+                stats["errors"] += 1
+                continue
+            stats["latencies"].append(elapsed)
+            if queries is not None:
+                stats["queries"].append(int(queries))
+            if operation == "POST /bookings" and status == 200:
+                self.bookings.append((json.loads(payload)["booking_id"], "Pending"))
+        self.connection.close()
+
+
+def load_dataset(database_url: str):
+    engine = create_engine(database_url, poolclass=NullPool)
+    with engine.connect() as connection:
+        row = connection.execute(text("""
+            SELECT (SELECT MAX(item_id) FROM items) AS items,
+                   (SELECT MAX(user_id) FROM users) AS users,
+                   (SELECT COUNT(*) FROM booking_items) AS lines
+        """)).one()
+    engine.dispose()
+    return {"items": row.items or 1, "users": row.users or 1, "lines": row.lines}
+
+
+def run(base_url, dataset, mix, concurrency, duration, seed):
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+    image = sample_image()
+    deadline = time.perf_counter() + duration
+    workers = [Worker(n, base_url, dataset, seed, image) for n in range(concurrency)]
+    per_worker = [{op: {"latencies": [], "queries": [], "errors": 0} for op in operations} for _ in workers]
+    threads = [
+        threading.Thread(target=worker.run, args=(operations, weights, deadline, results))
+        for worker, results in zip(workers, per_worker)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    report = {"concurrency": concurrency, "duration": round(wall, 2), "paths": {}}
+    for op in operations:
+        latencies = [x for results in per_worker for x in results[op]["latencies"]]
+        queries = [x for results in per_worker for x in results[op]["queries"]]
+        report["paths"][op] = {
+            "requests": len(latencies),
+            "errors": sum(results[op]["errors"] for results in per_worker),
+            "rps": round(len(latencies) / wall, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+            "mean_queries": round(statistics.fmean(queries), 2) if queries else 0.0,
+            "max_queries": max(queries) if queries else 0,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'operation':30} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for op, stats in report["paths"].items():
+        print(f"{op:30} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['mean_queries']:>8}")
+    total = sum(stats["requests"] for stats in report["paths"].values())
+    print(f"total {total} requests, {round(total / report['duration'], 1)} rps")
+
+
+def start_server(database_url: str, port: int, workers: int):
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "IMAGE_STORAGE": "stub",
+        # Several workers need the shared event channel to stay consistent
+        "EVENTS_BACKEND": "postgres" if workers > 1 else "local",
+        # Seeded histories hold thousands of past-due loans; keep the sweep
+        # out of the numbers unless asked for
+        "OVERDUE_SWEEP_INTERVAL": os.getenv("OVERDUE_SWEEP_INTERVAL", "0"),
+        # Every simulated user comes from 127.0.0.1, one rate limit bucket
+        "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "false"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("Server did not start")
+
+
+def parse_mix(values):
+    mix = dict(DEFAULT_MIX)
+    for value in values or []:
+        op, _, weight = value.rpartition("=")
+        if op not in DEFAULT_MIX:
+            sys.exit(f"Unknown operation in --mix: {op}")
+        mix[op] = float(weight)
+    return {op: weight for op, weight in mix.items() if weight > 0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--start-server", action="store_true", help="run uvicorn on --port against --database-url")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", action="append", metavar="OPERATION=WEIGHT")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    dataset = load_dataset(args.database_url)
+    server = start_server(args.database_url, args.port, args.server_workers) if args.start_server else None
+    base_url = f"http://127.0.0.1:{args.port}" if server else args.url
+    try:
+        report = run(base_url, dataset, mix, args.concurrency, args.duration, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report["meta"] = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": dataset, "mix": mix, "seed": args.seed, "server_workers": args.server_workers,
+    }
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,113 @@
+"""
+Rate limiter microbenchmark: microseconds per request that ratelimit.py adds.
+
+  - take(): one token bucket update
+  - check(): rule lookup, client address and bucket, as run per request
+  - middleware: a request through RateLimitMiddleware minus the same request
+    sent straight to a bare ASGI app, for requests that pass and for
+    requests answered with 429
+
+No database is needed. The budget is 50 us per passing request; the run
+exits non-zero if the middleware goes over it.
+
+    python benchmarks/ratelimit_bench.py --requests 200000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BUDGET_US = 50
+
+
+def make_scope(path: str, client: str, method: str = "GET"):
+    return {
+        "type": "http", "method": method, "path": path, "client": (client, 50000),
+        "headers": [(b"host", b"localhost"), (b"user-agent", b"bench"), (b"accept", b"*/*")],
+    }
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def best_of(function, count: int, repeat: int) -> list:
+    """Microseconds per call when function(count) makes `count` calls, per repeat."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(count)
+        samples.append((time.perf_counter() - started) / count * 1e6)
+    return samples
+
+
+def run_asgi(app, scopes, count: int):
+    async def drive():
+        for i in range(count):
+            await app(scopes[i % len(scopes)], receive, send)
+    asyncio.run(drive())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of the rate limiter.")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=5_000, help="Distinct client addresses")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import ratelimit
+    from ratelimit import RATE_LIMITS, RateLimitMiddleware, TokenBucketLimiter
+
+    clients = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.clients)]
+    paths = ["/items", "/items/search", "/my-bookings", "/admin/bookings", "/items/42/availability"]
+    scopes = [make_scope(paths[i % len(paths)], client) for i, client in enumerate(clients)]
+    # Limits high enough that every request passes
+    passing = RateLimitMiddleware(bare_app, enabled=True)
+    ratelimit.limiters = {name: TokenBucketLimiter(1e9, 1e9) for name in RATE_LIMITS}
+
+    limiter = TokenBucketLimiter(1e9, 1e9)
+    rows = [
+        ("take()", best_of(lambda n: [limiter.take(clients[i % len(clients)], time.monotonic()) for i in range(n)],
+                           args.requests, args.repeat)),
+        ("check()", best_of(lambda n: [passing.check(scopes[i % len(scopes)], time.monotonic()) for i in range(n)],
+                            args.requests, args.repeat)),
+    ]
+    bare = best_of(lambda n: run_asgi(bare_app, scopes, n), args.requests, args.repeat)
+    through = best_of(lambda n: run_asgi(passing, scopes, n), args.requests, args.repeat)
+    overhead = [max(0.0, t - b) for t, b in zip(sorted(through), sorted(bare))]
+    rows.append(("middleware, passing (minus bare app)", overhead))
+
+    # One client far over its limit: every request is answered with 429
+    ratelimit.limiters = {name: TokenBucketLimiter(1e-9, 1) for name in RATE_LIMITS}
+    rejecting = RateLimitMiddleware(bare_app, enabled=True)
+    flood = [make_scope("/items", "10.0.0.1")]
+    rejected = best_of(lambda n: run_asgi(rejecting, flood, n), args.requests, args.repeat)
+    rows.append(("middleware, rejected with 429", [max(0.0, r - b) for r, b in zip(sorted(rejected), sorted(bare))]))
+
+    print(f"\n{args.requests} requests, {args.clients} clients, best/median of {args.repeat}")
+    print(f"{'step':40} {'best us':>10} {'median us':>10}")
+    for name, samples in rows:
+        print(f"{name:40} {min(samples):10.2f} {statistics.median(samples):10.2f}")
+
+    median_overhead = statistics.median(overhead)
+    verdict = "within" if median_overhead < BUDGET_US else "OVER"
+    print(f"\nPassing request overhead {median_overhead:.2f} us: {verdict} the {BUDGET_US} us budget")
+    if median_overhead >= BUDGET_US:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Seed a local Postgres with a synthetic catalog, users and booking history.
+
+Everything is generated inside Postgres with generate_series, so even the
+largest preset (1M booking lines) loads in well under a minute. The target
+database is wiped first (TRUNCATE ... RESTART IDENTITY) and migrated with
+migrate.py, which is why only local hosts are accepted.
+
+    createdb fibo_bench
+    python benchmarks/seed.py --database-url postgresql://postgres@localhost/fibo_bench --scale medium
+
+Presets (--scale) can be overridden piecewise with --items, --users and
+--lines. Booking ids run 1..lines/3 and users are bench-user-<n>@example.com,
+which mixed_load.py relies on.
+
+The data comes from Postgres' random(), seeded with --seed (default 1)
+before anything is generated, so the same seed, scale and day give the same
+database and benchmark runs can be compared.
+"""
+import argparse
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from migrate import migrate
+from reservations import HELD_TODAY
+
+SCALES = {
+    "small": {"items": 200, "users": 100, "lines": 1_000},
+    "medium": {"items": 2_000, "users": 5_000, "lines": 100_000},
+    "large": {"items": 10_000, "users": 50_000, "lines": 1_000_000},
+}
+
+LINES_PER_BOOKING = 3
+
+CATEGORIES = [
+    "Motors", "Sensors", "Microcontrollers", "Power", "Cables", "Tools",
+    "Mechanical", "Pneumatics", "Displays", "Communication", "Batteries", "General",
+]
+
+SEED_SQL = [
+    ("items", """
+        INSERT INTO items (name, category, description, total_quantity, available_quantity, specifications, image_status)
+        SELECT 'Bench Part ' || n,
+               (CAST(:categories AS text[]))[1 + n % cardinality(CAST(:categories AS text[]))],
+               'Synthetic item ' || n || ' for load testing, gear motor sensor kit',
+               stock, stock,
+               jsonb_build_object(
+                   'voltage', (ARRAY['3.3V', '5V', '12V', '24V'])[1 + n % 4],
+                   'rpm', (100 + n % 20 * 50)::text,
+                   'unit', 'pcs'
+               ),
+               'ready'
+        FROM (SELECT n, 50 + (random() * 450)::int AS stock FROM generate_series(1, :items) AS n) s
+    """),
+    ("users", """
+        INSERT INTO users (email, full_name, role)
+        SELECT 'bench-user-' || n || '@example.com', 'Bench User ' || n, 'Student'
+        FROM generate_series(1, :users) AS n
+    """),
+    # Mostly returned history, with a live tail of pending and approved loans
+    ("bookings", """
+        INSERT INTO bookings (user_id, pickup_date, due_date, purpose, status, created_at, approved_at, returned_at)
+        SELECT user_id, pickup, pickup + loan_days, 'Synthetic booking', status,
+               pickup - interval '2 days',
+               CASE WHEN status IN ('Approved', 'Returned') THEN pickup - interval '1 day' END,
+               CASE WHEN status = 'Returned' THEN pickup + loan_days + (random() * 3)::int - 1 END
+        FROM (
+            SELECT 1 + (random() * (:users - 1))::int AS user_id,
+                   CURRENT_DATE - (random() * 365)::int AS pickup,
+                   1 + (random() * 13)::int AS loan_days,
+                   CASE WHEN r < 0.10 THEN 'Pending'
+                        WHEN r < 0.30 THEN 'Approved'
+                        WHEN r < 0.40 THEN 'Rejected'
+                        ELSE 'Returned' END AS status
+            FROM (SELECT random() AS r FROM generate_series(1, :bookings)) s
+        ) b
+    """),
+    ("booking_items", """
+        INSERT INTO booking_items (booking_id, item_id, quantity)
+        SELECT 1 + (n - 1) / :per_booking, 1 + (random() * (:items - 1))::int, 1 + (random() * 2)::int
+        FROM generate_series(1, :lines) AS n
+    """),
+    ("item_reservations", """
+        INSERT INTO item_reservations (booking_id, item_id, quantity, period)
+        SELECT bi.booking_id, bi.item_id, bi.quantity, daterange(b.pickup_date, b.due_date, '[]')
+        FROM booking_items bi
+        JOIN bookings b ON b.booking_id = bi.booking_id
+        WHERE b.status IN ('Pending', 'Approved')
+    """),
+    # The generated stock is what is free today; the open bookings come on top
+    ("items (totals)", f"""
+        UPDATE items i
+        SET total_quantity = i.available_quantity + held.quantity
+        FROM (
+            SELECT r.item_id, SUM(r.quantity) AS quantity
+            FROM item_reservations r
+            WHERE {HELD_TODAY}
+            GROUP BY r.item_id
+        ) held
+        WHERE i.item_id = held.item_id
+    """),
+]
+
+
+def check_local(database_url: str):
+    host = urlsplit(database_url).hostname
+    if host not in ("localhost", "127.0.0.1", "::1", None):
+        sys.exit(f"Refusing to wipe {host}: seed.py only runs against a local database")
+
+
+def seed(database_url: str, items: int, users: int, lines: int, random_seed: int = 1):
+    check_local(database_url)
+    migrate(database_url)
+
+    engine = create_engine(database_url, poolclass=NullPool)
+    params = {
+        "items": items, "users": users, "lines": lines,
+        "bookings": -(-lines // LINES_PER_BOOKING), "per_booking": LINES_PER_BOOKING,
+        "categories": CATEGORIES,
+    }
+    with engine.begin() as connection:
+        connection.execute(text(
+            "TRUNCATE item_reservations, booking_items, bookings, users, items RESTART IDENTITY CASCADE"
+        ))
+        # setseed takes a float in [-1, 1]; random() then repeats its sequence
+        # for the rest of this session
+        connection.execute(text("SELECT setseed(:seed)"), {"seed": (random_seed % 2**31) / 2**31})
+        for table, sql in SEED_SQL:
+            started = time.perf_counter()
+            count = connection.execute(text(sql), params).rowcount
+            print(f"{table:18} {count:>9} rows in {time.perf_counter() - started:6.2f}s", flush=True)
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+        for view in ("analytics_item_demand", "analytics_category_stats", "analytics_loan_summary"):
+            connection.execute(text(f"REFRESH MATERIALIZED VIEW {view}"))
+    return params
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--items", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--lines", type=int)
+    parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed gives the same data")
+    args = parser.parse_args()
+
+    size = {key: getattr(args, key) or value for key, value in SCALES[args.scale].items()}
+    seed(args.database_url, **size, random_seed=args.seed)
@@ -0,0 +1,113 @@
+"""
+Serialization microbenchmark: milliseconds per 10k rows for each way the API
+can turn catalog and booking rows into a JSON body.
+
+In memory, on item rows already fetched as dicts:
+  - jsonable_encoder + json.dumps, the old /items path and FastAPI's default
+  - response_model: validate, dump to Python, json.dumps (FastAPI with a model)
+  - TypeAdapter.dump_json: the same model validated and encoded by pydantic-core
+  - orjson: FastJSONResponse, the app's default response class now
+
+End to end (query + encode), against a seeded database:
+  - items and admin bookings fetched as Python objects and encoded as before
+  - the same rows rendered as JSON text by Postgres and joined (what the
+    hot endpoints do now)
+
+    python benchmarks/seed.py --database-url $BENCH_DATABASE_URL --scale medium
+    python benchmarks/serialization_bench.py --database-url $BENCH_DATABASE_URL --rows 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(function, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function()
+        samples.append(time.perf_counter() - started)
+    return samples, len(body)
+
+
+def report(title, cases, rows: int, repeat: int):
+    print(f"\n{title} ({rows} rows, best/median of {repeat})")
+    print(f"{'strategy':48} {'best ms/10k':>12} {'median':>10} {'bytes':>10}")
+    for name, function in cases:
+        samples, size = timed(function, repeat)
+        scale = 10_000 / rows * 1000
+        print(f"{name:48} {min(samples) * scale:12.1f} {statistics.median(samples) * scale:10.1f} {size:>10}")
+
+
+def main_bench(rows: int, repeat: int):
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import text
+
+    import main
+    from serialization import dumps, json_array, json_select
+
+    items_adapter = TypeAdapter(list[main.ItemOut])
+    engine = main.engine
+
+    def legacy_dumps(payload):
+        return json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+
+    item_columns = ", ".join(main.ITEM_FIELDS)
+    items_sql = text(f"SELECT {item_columns} FROM items ORDER BY item_id DESC LIMIT :rows")
+    items_json_sql = text(f"SELECT {json_select(main.ITEM_FIELDS)} FROM items ORDER BY item_id DESC LIMIT :rows")
+    bookings_sql = text(main.ADMIN_BOOKINGS_SQL + " ORDER BY b.booking_id DESC LIMIT :rows")
+    # What /admin/bookings ran before: psycopg2 parses each json column into dicts
+    bookings_parsed_sql = text(main.ADMIN_BOOKINGS_SQL.replace(" r)::text AS booking", " r) AS booking")
+                               + " ORDER BY b.booking_id DESC LIMIT :rows")
+
+    with engine.connect() as connection:
+        items = [dict(row._mapping) for row in connection.execute(items_sql, {"rows": rows})]
+    if len(items) < rows:
+        sys.exit(f"Only {len(items)} items in the database; seed a larger scale or lower --rows")
+
+    report("Items, in memory", [
+        ("jsonable_encoder + json.dumps (before)", lambda: legacy_dumps(items)),
+        ("response_model: validate + dump_python + dumps",
+         lambda: json.dumps(items_adapter.dump_python(items_adapter.validate_python(items), mode="json")).encode()),
+        ("TypeAdapter validate + dump_json", lambda: items_adapter.dump_json(items_adapter.validate_python(items))),
+        ("orjson (FastJSONResponse)", lambda: dumps(items)),
+    ], rows, repeat)
+
+    def fetch(sql, convert):
+        def run():
+            with engine.connect() as connection:
+                return convert(connection.execute(sql, {"rows": rows}))
+        return run
+
+    report("Items, query + encode", [
+        ("rows -> dicts -> jsonable_encoder (before)",
+         fetch(items_sql, lambda result: legacy_dumps([dict(row._mapping) for row in result]))),
+        ("rows -> dicts -> orjson", fetch(items_sql, lambda result: dumps([dict(row._mapping) for row in result]))),
+        ("Postgres JSON text -> json_array (now)", fetch(items_json_sql, lambda result: json_array(result.scalars()))),
+    ], rows, repeat)
+
+    report("Admin bookings, query + encode", [
+        ("parsed json -> jsonable_encoder (before)",
+         fetch(bookings_parsed_sql, lambda result: legacy_dumps([row.booking for row in result]))),
+        ("parsed json -> orjson", fetch(bookings_parsed_sql, lambda result: dumps([row.booking for row in result]))),
+        ("Postgres JSON text -> json_array (now)",
+         fetch(bookings_sql, lambda result: json_array(row.booking for row in result))),
+    ], rows, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # main builds its engine from DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    main_bench(args.rows, args.repeat)
@@ -0,0 +1,195 @@
+"""
+Cold-start benchmark: how long after the process starts do the first users
+get their pages, with and without the startup warm-up (startup.py)?
+
+Each run starts uvicorn against a database seeded by seed.py and measures:
+  - import: `import main` in a fresh interpreter
+  - open: spawn until the port answers (/healthz); includes the lifespan,
+    so the warm-up time when WARMUP_WAIT lets it finish first
+  - first burst: `--burst` requests to different hot endpoints sent at once
+    as soon as the port opens, like the visitors that woke the service up;
+    max is when the last of them got its response
+  - ready: spawn until /readyz answers 200
+  - steady: median latency of the same requests once everything is warm
+
+Neon adds TCP + TLS setup (and waking the compute) to every new connection,
+which a local database does not; `--connect-latency-ms` puts a proxy in
+front of the database that delays each new connection by that much.
+
+    python benchmarks/startup_bench.py --database-url $BENCH_DATABASE_URL \
+        --connect-latency-ms 150 --runs 5
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PATHS = [
+    "/items",
+    "/my-bookings?email=bench-user-1@example.com",
+    "/admin/bookings?limit=50",
+    "/items?limit=24",
+    "/admin/bookings/counts",
+]
+
+CONFIGS = {
+    "no warm-up": {"WARMUP": "false"},
+    "warm-up": {"WARMUP": "true"},
+}
+
+
+class DelayProxy(threading.Thread):
+    """TCP proxy that waits `delay` seconds before connecting each new client upstream."""
+
+    def __init__(self, host: str, port: int, delay: float):
+        super().__init__(daemon=True)
+        self.upstream = (host, port)
+        self.delay = delay
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+
+    def run(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.connect, args=(client,), daemon=True).start()
+
+    def connect(self, client):
+        time.sleep(self.delay)
+        try:
+            upstream = socket.create_connection(self.upstream)
+        except OSError:
+            client.close()
+            return
+        threading.Thread(target=self.pump, args=(client, upstream), daemon=True).start()
+        self.pump(upstream, client)
+
+    @staticmethod
+    def pump(source, target):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            source.close()
+            target.close()
+
+
+def get(port: int, path: str, timeout: float = 30):
+    """(status, milliseconds) of one GET on a fresh connection, or (None, ms) if refused."""
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - started) * 1000
+    except OSError:
+        return None, (time.perf_counter() - started) * 1000
+    finally:
+        connection.close()
+
+
+def measure_import(env: dict) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, env=env, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def run_once(env: dict, port: int, burst: int) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        while get(port, "/healthz", timeout=1)[0] != 200:
+            if server.poll() is not None:
+                sys.exit("Server exited during startup")
+            time.sleep(0.01)
+        opened = (time.perf_counter() - started) * 1000
+
+        results = [None] * burst
+
+        def first_request(n):
+            results[n] = get(port, FIRST_PATHS[n % len(FIRST_PATHS)])
+
+        threads = [threading.Thread(target=first_request, args=(n,)) for n in range(burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        burst_done = (time.perf_counter() - started) * 1000
+        if any(status != 200 for status, _ in results):
+            sys.exit(f"First requests failed: {[status for status, _ in results]}")
+
+        while get(port, "/readyz", timeout=1)[0] != 200:
+            time.sleep(0.01)
+        ready = (time.perf_counter() - started) * 1000
+
+        steady = [get(port, FIRST_PATHS[n % len(FIRST_PATHS)])[1] for n in range(burst * 4)]
+        latencies = [ms for _, ms in results]
+        return {
+            "open": opened, "burst_p50": statistics.median(latencies), "burst_max": max(latencies),
+            "burst_done": burst_done, "ready": ready, "steady": statistics.median(steady),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start latency with and without the warm-up.")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=5, help="Concurrent first requests (default: DB_POOL_SIZE)")
+    parser.add_argument("--connect-latency-ms", type=float, default=0,
+                        help="Delay added to every new database connection")
+    parser.add_argument("--port", type=int, default=8014)
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit("Set BENCH_DATABASE_URL or pass --database-url")
+
+    database_url = make_url(args.database_url)
+    if args.connect_latency_ms:
+        proxy = DelayProxy(database_url.host or "127.0.0.1", database_url.port or 5432, args.connect_latency_ms / 1000)
+        proxy.start()
+        database_url = database_url.set(host="127.0.0.1", port=proxy.port)
+
+    base_env = {
+        **os.environ,
+        "DATABASE_URL": database_url.render_as_string(hide_password=False),
+        "IMAGE_STORAGE": "stub",
+        "OVERDUE_SWEEP_INTERVAL": "0",
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    imports = [measure_import(base_env) for _ in range(args.runs)]
+    print(f"\nimport main: {statistics.median(imports):.0f} ms (median of {args.runs})")
+
+    print(f"{args.runs} runs each, burst of {args.burst}, +{args.connect_latency_ms:g} ms per new connection; "
+          "medians in ms")
+    print(f"{'config':12} {'open':>8} {'burst p50':>10} {'burst max':>10} {'burst done':>11} {'ready':>8} {'steady':>8}")
+    for name, overrides in CONFIGS.items():
+        runs = [run_once({**base_env, **overrides}, args.port, args.burst) for _ in range(args.runs)]
+        row = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{name:12} {row['open']:8.0f} {row['burst_p50']:10.1f} {row['burst_max']:10.1f} "
+              f"{row['burst_done']:11.0f} {row['ready']:8.0f} {row['steady']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
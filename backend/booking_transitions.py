@@ -0,0 +1,145 @@
+"""
+Booking status transitions.
+
+BOOKING_TRANSITIONS lists which status may follow which. A transition is
+applied with one statement for any number of bookings: the UPDATE only moves
+rows whose *current* status allows the target, and the restock deletes the
+moved bookings' reservations from the ledger and adds back, in one set-based
+UPDATE, the units they held today. Rejected and Returned are terminal, so
+stock can only ever be returned once per booking, even when two admins click
+at the same time (the second UPDATE re-checks the status after waiting for
+the row lock and moves nothing).
+
+Only a Pending booking can be Rejected: once Approved the items may be out,
+and restocking them before they come back would lend the same units twice.
+
+Overdue is an Approved loan past its due date (set by overdue.py); the items
+are still out, so it keeps its reservations until it is Returned.
+"""
+from sqlalchemy import text
+
+from events import publish_event
+from reservations import HELD_TODAY
+
+BOOKING_TRANSITIONS = {
+    "Pending": {"Approved", "Rejected"},
+    "Approved": {"Returned", "Overdue"},
+    "Overdue": {"Returned"},
+    "Rejected": set(),
+    "Returned": set(),
+}
+
+# Entering one of these releases the booking's reservations
+RESTOCK_STATUSES = {"Rejected", "Returned"}
+
+BOOKING_STATUSES = set(BOOKING_TRANSITIONS)
+
+# Booking ids per booking.status event
+EVENT_CHUNK_SIZE = 500
+
+# previous_status in TRANSITION_SQL comes from the statement's snapshot, taken
+# before the UPDATE waited for any row lock. A booking it did not move may
+# have been moved meanwhile by whoever held the lock, so before calling it
+# invalid, its status is read again with a fresh snapshot.
+CURRENT_STATUS_SQL = text("""
+    SELECT booking_id, status FROM bookings WHERE booking_id = ANY(CAST(:ids AS integer[]))
+""")
+
+TRANSITION_SQL = text(f"""
+    WITH moved AS (
+        UPDATE bookings
+        SET status = :status,
+            approved_at = CASE WHEN :status = 'Approved' THEN now() ELSE approved_at END,
+            returned_at = CASE WHEN :status = 'Returned' THEN now() ELSE returned_at END
+        WHERE booking_id = ANY(CAST(:ids AS integer[]))
+          AND status = ANY(CAST(:from_statuses AS varchar[]))
+        RETURNING booking_id
+    ),
+    released AS (
+        DELETE FROM item_reservations r
+        USING moved m
+        WHERE r.booking_id = m.booking_id AND :restock
+        RETURNING r.item_id, r.quantity, {HELD_TODAY} AS held_today
+    ),
+    restocked AS (
+        UPDATE items i
+        SET available_quantity = i.available_quantity + returned.quantity
+        FROM (
+            SELECT item_id, SUM(quantity) AS quantity
+            FROM released
+            WHERE held_today
+            GROUP BY item_id
+        ) returned
+        WHERE i.item_id = returned.item_id
+        RETURNING i.item_id, i.available_quantity
+    )
+    SELECT requested.booking_id,
+           u.email AS user_email,
+           b.status AS previous_status,
+           (m.booking_id IS NOT NULL) AS moved,
+           (SELECT json_agg(json_build_object('item_id', item_id, 'available_quantity', available_quantity))
+            FROM restocked) AS restocked_stock
+    FROM unnest(CAST(:ids AS integer[])) AS requested(booking_id)
+    LEFT JOIN bookings b ON b.booking_id = requested.booking_id
+    LEFT JOIN users u ON u.user_id = b.user_id
+    LEFT JOIN moved m ON m.booking_id = requested.booking_id
+""")
+
+
+def allowed_sources(status: str):
+    """Statuses a booking may be in to move to `status`."""
+    return sorted(source for source, targets in BOOKING_TRANSITIONS.items() if status in targets)
+
+
+def apply_transition(connection, booking_ids, status: str):
+    """
+    Move `booking_ids` to `status` inside the caller's transaction.
+
+    Returns a report with the ids that were `updated`, already `unchanged`
+    in the target status, `not_found`, or `invalid` for the transition
+    (with their current status), plus `restocked` when stock was returned
+    and the `user_emails` owning the moved bookings.
+    Publishes booking.status for the moved bookings and stock.changed for
+    the restocked items.
+    """
+    if status not in BOOKING_STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+
+    ids = sorted(set(booking_ids))
+    rows = connection.execute(TRANSITION_SQL, {
+        "ids": ids,
+        "status": status,
+        "from_statuses": allowed_sources(status),
+        "restock": status in RESTOCK_STATUSES,
+    }).fetchall()
+
+    report = {
+        "status": status, "updated": [], "unchanged": [], "not_found": [], "invalid": [],
+        "restocked": False, "user_emails": set(),
+    }
+    stock = rows[0].restocked_stock if rows else None
+    current = {row.booking_id: row.previous_status for row in rows if not row.moved}
+    stale = [booking_id for booking_id, previous in current.items() if previous not in (None, status)]
+    if stale:
+        # A concurrent transition to the same status makes these unchanged, not invalid
+        current.update(connection.execute(CURRENT_STATUS_SQL, {"ids": stale}).tuples().all())
+    for row in rows:
+        if row.moved:
+            report["updated"].append(row.booking_id)
+            report["user_emails"].add(row.user_email)
+        elif current[row.booking_id] is None:
+            report["not_found"].append(row.booking_id)
+        elif current[row.booking_id] == status:
+            report["unchanged"].append(row.booking_id)
+        else:
+            report["invalid"].append({"booking_id": row.booking_id, "current_status": current[row.booking_id]})
+
+    # Chunked to stay well inside the 8000 byte NOTIFY payload limit
+    for start in range(0, len(report["updated"]), EVENT_CHUNK_SIZE):
+        publish_event(connection, "booking.status", {
+            "booking_ids": report["updated"][start:start + EVENT_CHUNK_SIZE], "status": status
+        })
+    if stock:
+        report["restocked"] = True
+        publish_event(connection, "stock.changed", {"items": stock})
+    return report
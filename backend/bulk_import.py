@@ -0,0 +1,439 @@
+"""
+Bulk item import for POST /items/bulk.
+
+A manifest (CSV, JSON array or NDJSON) lists one item per row with the same
+fields as the item form: name, category, description, quantity, unit and
+specifications. Rows carrying an `item_id` update that item. Rows with a
+`sku` (an id of the caller's choosing, kept on the item) update the item
+with that sku or create it, so a manifest can be imported again without
+duplicating anything. Other rows create a new item. Two rows naming the same
+item_id or sku are refused, the later one reported as a duplicate. In CSV,
+`specifications` may be a JSON object and any `spec.<key>` column is merged
+into it. An optional zip holds the images, referenced by file name in the
+`image` column.
+
+Rows are validated first, then written `BULK_BATCH_SIZE` at a time with one
+multi-row statement per batch and kind of row. Images are handed to the image
+upload workers, so they are processed concurrently with at most
+IMAGE_UPLOAD_WORKERS running at once; the catalog is invalidated and a
+single event published when all images of a batch are done, not per image.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+from sqlalchemy import text
+
+from cache_sync import broadcast_invalidation
+from catalog_cache import catalog_cache
+from events import publish_event, write_transaction
+from images import schedule_item_image
+from reservations import HELD_TODAY
+
+logger = logging.getLogger("fibo.bulk_import")
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+
+# Allocates ids up front so each input row can be matched to its new item
+INSERT_BATCH_SQL = text("""
+    WITH input AS MATERIALIZED (
+        SELECT r.*, nextval(pg_get_serial_sequence('items', 'item_id')) AS new_id
+        FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+            row_no integer, name text, category text, description text,
+            quantity integer, specifications jsonb, has_image boolean
+        )
+    ),
+    inserted AS (
+        INSERT INTO items (item_id, name, category, description, total_quantity, available_quantity,
+                           specifications, image_status)
+        SELECT new_id, name, category, description, quantity, quantity, specifications,
+               CASE WHEN has_image THEN 'pending' ELSE 'ready' END
+        FROM input
+        RETURNING item_id
+    )
+    SELECT input.row_no, inserted.item_id
+    FROM input JOIN inserted ON inserted.item_id = input.new_id
+""")
+
+# `quantity` is what is on the shelf today, as in the item form
+UPDATE_BATCH_SQL = text(f"""
+    WITH input AS (
+        SELECT *
+        FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+            row_no integer, item_id integer, sku text, name text, category text, description text,
+            quantity integer, specifications jsonb, has_image boolean
+        )
+    ),
+    updated AS (
+        UPDATE items i
+        SET sku = COALESCE(input.sku, i.sku),
+            name = input.name,
+            category = input.category,
+            description = input.description,
+            available_quantity = input.quantity,
+            total_quantity = input.quantity + COALESCE((
+                SELECT SUM(r.quantity) FROM item_reservations r
+                WHERE r.item_id = i.item_id AND {HELD_TODAY}
+            ), 0),
+            specifications = input.specifications,
+            image_status = CASE WHEN input.has_image THEN 'pending' ELSE i.image_status END
+        FROM input
+        WHERE i.item_id = input.item_id
+        RETURNING i.item_id
+    )
+    SELECT input.row_no, updated.item_id
+    FROM input LEFT JOIN updated ON updated.item_id = input.item_id
+""")
+
+# Insert or update by sku; `created` tells which (xmax is 0 for a fresh row)
+UPSERT_BATCH_SQL = text(f"""
+    WITH input AS (
+        SELECT *
+        FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+            row_no integer, sku text, name text, category text, description text,
+            quantity integer, specifications jsonb, has_image boolean
+        )
+    ),
+    upserted AS (
+        INSERT INTO items (sku, name, category, description, total_quantity, available_quantity,
+                           specifications, image_status)
+        SELECT sku, name, category, description, quantity, quantity, specifications,
+               CASE WHEN has_image THEN 'pending' ELSE 'ready' END
+        FROM input
+        ON CONFLICT (sku) DO UPDATE
+        SET name = EXCLUDED.name,
+            category = EXCLUDED.category,
+            description = EXCLUDED.description,
+            available_quantity = EXCLUDED.available_quantity,
+            total_quantity = EXCLUDED.available_quantity + COALESCE((
+                SELECT SUM(r.quantity) FROM item_reservations r
+                WHERE r.item_id = items.item_id AND {HELD_TODAY}
+            ), 0),
+            specifications = EXCLUDED.specifications,
+            image_status = CASE WHEN EXCLUDED.image_status = 'pending' THEN 'pending' ELSE items.image_status END
+        RETURNING items.item_id, items.sku, xmax = 0 AS created
+    )
+    SELECT input.row_no, upserted.item_id, upserted.created
+    FROM input JOIN upserted ON upserted.sku = input.sku
+""")
+
+SKU_MAX_LENGTH = 64
+
+
+class ManifestError(ValueError):
+    """The manifest as a whole could not be read."""
+
+
+def detect_format(filename: str, declared: str = None) -> str:
+    if declared:
+        return declared.lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension == ".json":
+        return "json"
+    return "csv"
+
+
+def read_manifest(data: bytes, manifest_format: str):
+    content = data.decode("utf-8-sig")
+    try:
+        if manifest_format == "csv":
+            return list(csv.DictReader(io.StringIO(content)))
+        if manifest_format == "json":
+            rows = json.loads(content)
+            if not isinstance(rows, list):
+                raise ManifestError("JSON manifest must be an array of items")
+            return rows
+        if manifest_format == "ndjson":
+            return [json.loads(line) for line in content.splitlines() if line.strip()]
+    except (json.JSONDecodeError, csv.Error) as e:
+        raise ManifestError(f"Could not parse {manifest_format} manifest: {e}")
+    raise ManifestError(f"Unknown manifest format: {manifest_format}")
+
+
+def text_field(raw: dict, field: str, default: str = "") -> str:
+    value = raw.get(field)
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+def integer_field(raw: dict, field: str):
+    """The integer in `field`, or None when it is empty."""
+    value = raw.get(field)
+    if value is None or value == "":
+        return None
+    # JSON writers may send 3.0 for 3, but 2.7 is a mistake, not 2
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (bool, float)):
+        raise ValueError(f"{field} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer")
+
+
+def normalize_row(raw: dict):
+    """Validate one manifest row; returns the cleaned row or raises ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError("row must be an object")
+    if None in raw:
+        # csv.DictReader files the cells past the last header under None
+        raise ValueError("row has more columns than the header")
+    name = text_field(raw, "name").strip()
+    if not name:
+        raise ValueError("name is required")
+
+    quantity = integer_field(raw, "quantity") or 0
+    if quantity < 0:
+        raise ValueError("quantity cannot be negative")
+
+    item_id = integer_field(raw, "item_id")
+
+    sku = raw.get("sku")
+    # A numeric sku from JSON is kept as its text
+    sku = (str(sku) if isinstance(sku, int) and not isinstance(sku, bool) else text_field(raw, "sku")).strip() or None
+    if sku is not None and len(sku) > SKU_MAX_LENGTH:
+        raise ValueError(f"sku is limited to {SKU_MAX_LENGTH} characters")
+
+    specifications = raw.get("specifications") or {}
+    if isinstance(specifications, str):
+        try:
+            specifications = json.loads(specifications)
+        except json.JSONDecodeError:
+            raise ValueError("specifications must be a JSON object")
+    if not isinstance(specifications, dict):
+        raise ValueError("specifications must be a JSON object")
+    for key, value in raw.items():
+        if key.startswith("spec.") and value not in (None, ""):
+            specifications[key[len("spec."):]] = value
+    # Same convention as create_item: the unit lives in specifications
+    specifications["unit"] = text_field(raw, "unit") or specifications.get("unit") or "pcs"
+
+    return {
+        "item_id": item_id,
+        "sku": sku,
+        "name": name,
+        "category": text_field(raw, "category", "General").strip(),
+        "description": text_field(raw, "description"),
+        "quantity": quantity,
+        "specifications": specifications,
+        "image": text_field(raw, "image").strip() or None,
+    }
+
+
+class PendingImages:
+    """
+    Counts image uploads queued with track() and calls finished() once all of
+    them are done and done_scheduling() has been called.
+    """
+
+    def __init__(self):
+        # Starts at one for the scheduling pass itself, see done_scheduling()
+        self._pending = 1
+        self._lock = threading.Lock()
+
+    def track(self, future):
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._release)
+
+    def done_scheduling(self):
+        self._release(None)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self.finished()
+
+    def finished(self):
+        pass
+
+
+class ImageArchive(PendingImages):
+    """
+    Keeps the uploaded zip on disk until every image queued from it has been
+    processed, so workers read members lazily instead of holding all image
+    bytes in memory.
+    """
+
+    def __init__(self, source_file):
+        handle, self.path = tempfile.mkstemp(suffix=".zip")
+        with os.fdopen(handle, "wb") as target:
+            shutil.copyfileobj(source_file, target)
+        try:
+            with zipfile.ZipFile(self.path) as archive:
+                self.members = {
+                    os.path.basename(info.filename): info.filename
+                    for info in archive.infolist() if not info.is_dir()
+                }
+        except zipfile.BadZipFile:
+            os.remove(self.path)
+            raise ManifestError("images must be a zip archive")
+        super().__init__()
+
+    def __contains__(self, name):
+        return os.path.basename(name) in self.members
+
+    def loader(self, name):
+        member = self.members[os.path.basename(name)]
+
+        def load():
+            with zipfile.ZipFile(self.path) as archive:
+                return archive.read(member)
+        return load
+
+    def finished(self):
+        self.close()
+
+    def close(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ImageBatch(PendingImages):
+    """The images of one written batch, announced together once all are done."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def track(self, future):
+        self.count += 1
+        super().track(future)
+
+    def finished(self):
+        if not self.count:
+            return
+        try:
+            with write_transaction() as connection:
+                publish_event(connection, "catalog.changed", {"reason": "bulk_import_images", "items": self.count})
+                broadcast_invalidation(connection, "catalog")
+            catalog_cache.invalidate()
+        except Exception:
+            logger.exception("Could not announce %d imported images", self.count)
+
+
+def write_batches(rows):
+    """
+    Write validated rows batch by batch; yields one list per batch of
+    (row_no, item_id, status, error), status being "created" or "updated".
+    """
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        batch = rows[start:start + BULK_BATCH_SIZE]
+        inserts = [r for r in batch if r["item_id"] is None and r["sku"] is None]
+        upserts = [r for r in batch if r["item_id"] is None and r["sku"] is not None]
+        updates = [r for r in batch if r["item_id"] is not None]
+        try:
+            with write_transaction() as connection:
+                results = []
+                if inserts:
+                    for result in connection.execute(INSERT_BATCH_SQL, {"rows": json.dumps(inserts)}):
+                        results.append((result.row_no, result.item_id, "created", None))
+                if upserts:
+                    for result in connection.execute(UPSERT_BATCH_SQL, {"rows": json.dumps(upserts)}):
+                        results.append((result.row_no, result.item_id,
+                                        "created" if result.created else "updated", None))
+                if updates:
+                    for result in connection.execute(UPDATE_BATCH_SQL, {"rows": json.dumps(updates)}):
+                        if result.item_id is None:
+                            results.append((result.row_no, None, None, "item not found"))
+                        else:
+                            results.append((result.row_no, result.item_id, "updated", None))
+                # Too many rows for per-item deltas: clients refetch the catalog
+                publish_event(connection, "catalog.changed", {"reason": "bulk_import", "rows": len(batch)})
+                broadcast_invalidation(connection, "catalog")
+        except Exception as e:
+            yield [(row["row_no"], None, None, f"batch failed: {e.__class__.__name__}") for row in batch]
+            continue
+        yield results
+
+
+def find_duplicates(rows):
+    """{row_no: error} for rows naming an item_id or sku an earlier row already did."""
+    seen = {}
+    duplicates = {}
+    for row in rows:
+        for field in ("item_id", "sku"):
+            if row[field] is None:
+                continue
+            first = seen.setdefault((field, row[field]), row["row_no"])
+            if first != row["row_no"]:
+                duplicates[row["row_no"]] = f"duplicate of row {first} (same {field})"
+                break
+    return duplicates
+
+
+def run_bulk_import(manifest_data: bytes, manifest_format: str, images_file=None):
+    raw_rows = read_manifest(manifest_data, manifest_format)
+    archive = ImageArchive(images_file) if images_file is not None else None
+
+    report = {}
+    valid = []
+    for row_no, raw in enumerate(raw_rows, start=1):
+        try:
+            row = normalize_row(raw)
+        except ValueError as e:
+            report[row_no] = {"row": row_no, "status": "error", "error": str(e)}
+            continue
+        image_missing = row["image"] and (archive is None or row["image"] not in archive)
+        valid.append({
+            **row,
+            "row_no": row_no,
+            "has_image": bool(row["image"]) and not image_missing,
+            "image_missing": bool(image_missing),
+        })
+
+    # Which of two rows for the same item wins would depend on the statement
+    # order inside a batch: keep the first and refuse the rest
+    duplicates = find_duplicates(valid)
+    for row_no, error in duplicates.items():
+        report[row_no] = {"row": row_no, "status": "error", "error": error}
+    valid = [row for row in valid if row["row_no"] not in duplicates]
+
+    by_row = {row["row_no"]: row for row in valid}
+    try:
+        for results in write_batches(valid):
+            images = ImageBatch()
+            try:
+                for row_no, item_id, status, error in results:
+                    row = by_row[row_no]
+                    if error:
+                        report[row_no] = {"row": row_no, "status": "error", "error": error}
+                        continue
+                    entry = {"row": row_no, "status": status, "item_id": item_id}
+                    if row["has_image"]:
+                        # Start on the images while later batches are still being written
+                        future = schedule_item_image(item_id, archive.loader(row["image"]), row["image"], notify=False)
+                        archive.track(future)
+                        images.track(future)
+                        entry["image_status"] = "pending"
+                    elif row["image_missing"]:
+                        entry["warning"] = f"image {row['image']} not found in archive"
+                    report[row_no] = entry
+            finally:
+                images.done_scheduling()
+    finally:
+        if archive is not None:
+            archive.done_scheduling()
+
+    rows = [report[n] for n in sorted(report)]
+    return {
+        "total": len(raw_rows),
+        "created": sum(1 for r in rows if r["status"] == "created"),
+        "updated": sum(1 for r in rows if r["status"] == "updated"),
+        "failed": sum(1 for r in rows if r["status"] == "error"),
+        "rows": rows,
+    }
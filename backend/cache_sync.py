@@ -0,0 +1,84 @@
+"""
+Cache coherence across uvicorn workers.
+
+catalog_cache and the /my-bookings history cache live in each worker's
+memory. The worker that commits a write drops its own stale entries right
+after the commit, as before; `broadcast_invalidation`, called inside the
+write's transaction, has every other worker drop them too. It sends a
+pg_notify on CACHE_CHANNEL, which Postgres delivers only when the
+transaction commits, so a rolled-back write invalidates nothing.
+
+This only happens with EVENTS_BACKEND=postgres, the multi-worker setup, whose
+listener connection (events.py) relays the channel. With "local" there is
+one worker and nobody else to tell. A worker whose listener had to reconnect
+may have missed invalidations and drops everything it has cached.
+
+Every invalidation, local or received, also marks the data as just written
+for replicas.py, so the reads that refill the cache go to the primary.
+
+(user_cache needs none of this: a user's id never changes.)
+"""
+import json
+import logging
+import os
+import uuid
+
+from events import EVENTS_BACKEND, MAX_NOTIFY_BYTES, NOTIFY_SQL, listen
+from replicas import router
+
+logger = logging.getLogger("fibo.cache_sync")
+
+CACHE_CHANNEL = os.getenv("CACHE_CHANNEL", "fibo_cache")
+
+# Tags this worker's notifications, which it has already applied itself
+WORKER_ID = uuid.uuid4().hex
+
+# Cache name -> invalidate(keys), where keys=None means everything
+_caches = {}
+
+
+def register_cache(name: str, invalidate):
+    _caches[name] = invalidate
+
+
+def broadcast_invalidation(connection, name: str, keys=None):
+    """Have the other workers drop `keys` (None for all) from cache `name` once this transaction commits."""
+    if keys is not None:
+        keys = list(keys)
+        if not keys:
+            return
+    router.mark_written(name, keys)
+    if EVENTS_BACKEND != "postgres":
+        return
+    payload = json.dumps({"worker": WORKER_ID, "cache": name, "keys": keys})
+    if len(payload.encode()) > MAX_NOTIFY_BYTES:
+        payload = json.dumps({"worker": WORKER_ID, "cache": name, "keys": None})
+    connection.execute(NOTIFY_SQL, {"channel": CACHE_CHANNEL, "payload": payload})
+
+
+def invalidate_local(name: str, keys=None):
+    """Drop `keys` (None for all) from this worker's cache `name`, for writers outside main.py."""
+    invalidate = _caches.get(name)
+    if invalidate is not None:
+        invalidate(list(keys) if keys is not None else None)
+
+
+def _apply_invalidation(message):
+    try:
+        if message is None:
+            # The listener reconnected: anything may be stale
+            for name, invalidate in _caches.items():
+                router.mark_written(name)
+                invalidate(None)
+            return
+        if message.get("worker") == WORKER_ID:
+            return
+        router.mark_written(message.get("cache"), message.get("keys"))
+        invalidate = _caches.get(message.get("cache"))
+        if invalidate is not None:
+            invalidate(message.get("keys"))
+    except Exception:
+        logger.exception("Failed to apply cache invalidation %r", message)
+
+
+listen(CACHE_CHANNEL, _apply_invalidation)
@@ -0,0 +1,57 @@
+"""
+In-process cache for serialized catalog responses.
+
+Entries hold the exact response bytes and an ETag derived from them, so a hit
+costs no query and no JSON encoding. Every write that touches `items` calls
+`invalidate()`, which bumps the version; a reader that started before the bump
+will not store its (possibly stale) result.
+"""
+import hashlib
+import threading
+
+
+class CatalogCache:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, key):
+        """Return (body, etag) for `key`, or None on a miss."""
+        return self._entries.get(key)
+
+    def put(self, key, version: int, body: bytes):
+        """Store `body` if no write happened since `version` was read."""
+        entry = (body, make_etag(body))
+        with self._lock:
+            # Deep pages and odd filter combinations are not worth evicting for
+            if version == self._version and len(self._entries) < self.max_entries:
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,287 @@
+"""
+Live catalog and booking events, pushed to browsers over Server-Sent Events.
+
+Write paths open their transaction with `write_transaction()` and call
+`publish_event(connection, type, data)` inside it, so an event only goes out
+once the change has committed. Events are small deltas, for example
+
+    {"type": "stock.changed", "data": {"items": [{"item_id": 3, "available_quantity": 4}]}}
+    {"type": "booking.status", "data": {"booking_ids": [12, 14], "status": "Approved"}}
+
+and never carry user names or emails, since the stream is public. A
+`resync` event means events may have been lost and the client should refetch.
+
+`EVENTS_BACKEND` picks how events reach the subscribers:
+
+- "local" (default): delivered to the clients of this process after COMMIT
+  has returned, and dropped if the transaction fails. Enough for a single
+  uvicorn worker.
+- "postgres": sent with pg_notify on EVENTS_CHANNEL. Every worker (this one
+  included) LISTENs on a dedicated connection and relays what it hears, so
+  clients see every change whichever worker they are connected to.
+  LISTEN needs a session of its own, which PgBouncer-style poolers (Neon's
+  "-pooler" host) cannot give; point EVENTS_DATABASE_URL at the direct host.
+
+Other modules can have private channels relayed by the same listener
+connection with `listen(channel, handler)`; cache_sync.py uses one to keep
+the per-worker caches coherent.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from sqlalchemy import event, text
+
+from db import engine
+
+logger = logging.getLogger("fibo.events")
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local").lower()
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "fibo_events")
+# Connection for LISTEN; defaults to DATABASE_URL
+EVENTS_DATABASE_URL = os.getenv("EVENTS_DATABASE_URL")
+# Seconds between SSE comment lines that keep proxies from closing idle streams
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Events buffered per client; a client that falls this far behind gets a resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+
+NOTIFY_SQL = text("SELECT pg_notify(:channel, :payload)")
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_BYTES = 7900
+
+
+class Subscriber:
+    def __init__(self, types=None):
+        # Event type prefixes this client wants, e.g. {"stock", "item"}; None for all
+        self.types = types
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event_type: str) -> bool:
+        if self.types is None or event_type == "resync":
+            return True
+        return event_type.split(".", 1)[0] in self.types
+
+
+class EventBus:
+    """
+    Fans events out to the SSE clients of this process. `publish` may be called
+    from any thread; delivery happens on the event loop captured by `start`.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def start(self, loop):
+        self._loop = loop
+
+    def stop(self):
+        self._loop = None
+
+    def subscribe(self, types=None) -> Subscriber:
+        subscriber = Subscriber(types)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event_message: dict):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            # No app running (scripts, benchmarks): nobody to tell
+            return
+        loop.call_soon_threadsafe(self._deliver, event_message)
+
+    def _deliver(self, event_message: dict):
+        event_message = {**event_message, "id": next(self._ids)}
+        for subscriber in list(self._subscribers):
+            if not subscriber.wants(event_message["type"]):
+                continue
+            try:
+                subscriber.queue.put_nowait(event_message)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+
+
+event_bus = EventBus()
+
+
+def publish_event(connection, event_type: str, data: dict):
+    """Queue an event on `connection`, a write_transaction(); it is sent once the transaction commits."""
+    message = {"type": event_type, "data": data}
+    if EVENTS_BACKEND == "postgres":
+        # NOTIFY is transactional: Postgres holds it back until COMMIT and
+        # drops it on ROLLBACK
+        payload = json.dumps(message, default=str)
+        if len(payload.encode()) > MAX_NOTIFY_BYTES:
+            payload = json.dumps({"type": "resync", "data": {}})
+        connection.execute(NOTIFY_SQL, {"channel": EVENTS_CHANNEL, "payload": payload})
+    else:
+        connection.info.setdefault("pending_events", []).append(message)
+
+
+# Private pg_notify channels relayed by the listener: channel -> handlers
+_channel_handlers = {}
+
+
+def listen(channel: str, handler):
+    """
+    Call `handler(message)` with every JSON payload NOTIFYed on `channel`
+    (postgres backend only), and `handler(None)` after the listener had to
+    reconnect, since messages may have been missed meanwhile. Register before
+    start_events().
+    """
+    _channel_handlers.setdefault(channel, []).append(handler)
+
+
+def publish_after_commit(connection):
+    """Deliver the events queued on `connection`; call only once its transaction has committed."""
+    for message in connection.info.pop("pending_events", ()):
+        event_bus.publish(message)
+
+
+@contextmanager
+def write_transaction():
+    """
+    engine.begin() for writes that publish events. The engine's "commit" event
+    fires before COMMIT is sent, so delivery waits until the block has exited
+    and the commit returned; a transaction that fails drops its events.
+    """
+    with engine.connect() as connection:
+        try:
+            with connection.begin():
+                yield connection
+        except BaseException:
+            connection.info.pop("pending_events", None)
+            raise
+        publish_after_commit(connection)
+
+
+@event.listens_for(engine, "rollback")
+def _drop_pending_events(connection):
+    connection.info.pop("pending_events", None)
+
+
+@event.listens_for(engine, "checkin")
+def _drop_stray_events(dbapi_connection, connection_record):
+    # connection.info outlives the checkout: never let events published
+    # outside write_transaction() go out with the next user's commit
+    if connection_record is not None and connection_record.info.pop("pending_events", None):
+        logger.warning("Dropped events published outside write_transaction()")
+
+
+class NotificationListener(threading.Thread):
+    """
+    Relays pg_notify payloads from EVENTS_CHANNEL into the local event bus,
+    and those of the channels registered with `listen` to their handlers.
+    """
+
+    def __init__(self, bus: EventBus, channel: str = EVENTS_CHANNEL):
+        super().__init__(name="events-listener", daemon=True)
+        self.bus = bus
+        self.channel = channel
+        self.handlers = {channel: [bus.publish], **_channel_handlers}
+        self._stopping = threading.Event()
+        self._reconnecting = False
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        dsn = EVENTS_DATABASE_URL or engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stopping.is_set():
+            try:
+                self._listen(dsn)
+            except Exception:
+                logger.exception("Lost the %s listener connection, reconnecting", self.channel)
+                # Clients may have missed events while we were away
+                self.bus.publish({"type": "resync", "data": {}})
+                self._reconnecting = True
+                self._stopping.wait(2)
+
+    def _listen(self, dsn: str):
+        connection = psycopg2.connect(dsn)
+        try:
+            connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                for channel in self.handlers:
+                    cursor.execute(f'LISTEN "{channel}"')
+            if self._reconnecting:
+                # Listening again; private channels catch up on what they missed
+                self._reconnecting = False
+                for channel, handlers in self.handlers.items():
+                    if channel != self.channel:
+                        for handler in handlers:
+                            handler(None)
+            while not self._stopping.is_set():
+                # Wake up now and then to notice stop() and dead connections
+                if select.select([connection], [], [], 5) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    try:
+                        message = json.loads(notification.payload)
+                    except ValueError:
+                        logger.warning("Ignoring malformed event payload: %r", notification.payload)
+                        continue
+                    for handler in self.handlers.get(notification.channel, ()):
+                        handler(message)
+        finally:
+            connection.close()
+
+
+_listener = None
+
+
+def start_events(loop):
+    global _listener
+    event_bus.start(loop)
+    if EVENTS_BACKEND == "postgres":
+        _listener = NotificationListener(event_bus)
+        _listener.start()
+
+
+def stop_events():
+    global _listener
+    event_bus.stop()
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        listener.join(timeout=10)
+
+
+async def event_stream(subscriber: Subscriber, is_disconnected):
+    """Yield SSE frames for `subscriber` until the client goes away."""
+    # Browsers wait this long (ms) before reconnecting a dropped stream
+    yield "retry: 3000\n\n"
+    try:
+        while not await is_disconnected():
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if subscriber.overflowed:
+                # Too slow to keep up: drop the backlog and have the client refetch
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.overflowed = False
+                message = {"type": "resync", "data": {}}
+
+            frame = f"event: {message['type']}\n"
+            if "id" in message:
+                frame += f"id: {message['id']}\n"
+            yield frame + f"data: {json.dumps(message['data'], default=str)}\n\n"
+    finally:
+        event_bus.unsubscribe(subscriber)
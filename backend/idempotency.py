@@ -0,0 +1,130 @@
+"""
+Idempotency keys for booking writes.
+
+A client that may send the same write twice (a double-clicked checkout, a
+retry over a flaky connection) puts a unique `Idempotency-Key` header on it.
+The first request with a key runs; every later one with the same key gets the
+first response back, marked `Idempotent-Replayed: true`, instead of running
+again. A key sent with a different request is rejected with 422.
+
+Keys live in the idempotency_keys table (migrations/0011), so every worker
+sees them. A key is claimed inside the transaction of the write it guards,
+with an INSERT that waits on the primary key while another transaction holds
+the same key: a concurrent retry blocks until the first attempt finishes, then
+replays its response if it committed or runs itself if it rolled back.
+Failed attempts (4xx/5xx raised inside the transaction) roll back together
+with their key, so they can simply be retried.
+
+Keys expire after IDEMPOTENCY_KEY_TTL seconds and are purged now and then
+by whichever worker is claiming one.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException, Response
+from sqlalchemy import text
+
+from serialization import dumps
+
+logger = logging.getLogger("fibo.idempotency")
+
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Seconds between purges of expired keys, per worker
+PURGE_INTERVAL = 3600
+
+# Claims the key unless a live one exists; an expired key is taken over.
+# Returns a row only when the key is ours.
+CLAIM_SQL = text("""
+    INSERT INTO idempotency_keys (scope, key, request_hash)
+    VALUES (:scope, :key, :request_hash)
+    ON CONFLICT (scope, key) DO UPDATE
+    SET request_hash = EXCLUDED.request_hash, status_code = NULL, response_body = NULL, created_at = now()
+    WHERE idempotency_keys.created_at < now() - make_interval(secs => :ttl)
+    RETURNING scope
+""")
+
+STORED_SQL = text("""
+    SELECT request_hash, status_code, response_body
+    FROM idempotency_keys
+    WHERE scope = :scope AND key = :key
+""")
+
+SAVE_SQL = text("""
+    UPDATE idempotency_keys
+    SET status_code = :status_code, response_body = :body
+    WHERE scope = :scope AND key = :key
+""")
+
+PURGE_SQL = text("DELETE FROM idempotency_keys WHERE created_at < now() - make_interval(secs => :ttl)")
+
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def _maybe_purge(connection):
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = time.monotonic()
+    purged = connection.execute(PURGE_SQL, {"ttl": IDEMPOTENCY_KEY_TTL}).rowcount
+    if purged:
+        logger.info("Purged %d expired idempotency keys", purged)
+
+
+class IdempotentRequest:
+    """A write guarded by an Idempotency-Key; `payload` is what makes two requests the same."""
+
+    def __init__(self, scope: str, key: str, payload):
+        self.scope = scope
+        self.key = key
+        self.request_hash = hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def _params(self, **extra):
+        return {"scope": self.scope, "key": self.key, **extra}
+
+    def claim(self, connection) -> Optional[Response]:
+        """
+        Claim the key inside the caller's transaction. Returns None when this
+        request should run, or the replayed response of the one that ran first.
+        """
+        while True:
+            claimed = connection.execute(CLAIM_SQL, self._params(
+                request_hash=self.request_hash, ttl=IDEMPOTENCY_KEY_TTL
+            )).first()
+            if claimed is not None:
+                _maybe_purge(connection)
+                return None
+            stored = connection.execute(STORED_SQL, self._params()).first()
+            # Gone between the two statements (purged as expired): claim again
+            if stored is not None:
+                break
+
+        if stored.request_hash != self.request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        return Response(
+            content=stored.response_body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    def save(self, connection, content, status_code: int = 200):
+        """Store the response for replays; call last, inside the same transaction as `claim`."""
+        connection.execute(SAVE_SQL, self._params(status_code=status_code, body=dumps(content).decode()))
+
+
+def idempotent_request(scope: str, key: Optional[str], payload) -> Optional[IdempotentRequest]:
+    """The IdempotentRequest for `key`, or None when the client sent no key."""
+    if key is None:
+        return None
+    return IdempotentRequest(scope, key, payload)
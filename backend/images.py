@@ -0,0 +1,227 @@
+"""
+Item image storage and the background upload pipeline.
+
+`IMAGE_STORAGE` picks the backend: "cloudinary" (default, production),
+"local", which writes into backend/uploads and serves the files from /static
+so everything works offline, or "stub", which discards the bytes after
+IMAGE_STUB_LATENCY_MS (for benchmarks). Uploads never run inside a request: the handler
+saves the item with `image_status = 'pending'` and hands the bytes to
+`schedule_item_image`, whose worker pool uploads them and fills in
+`image_url` when done.
+
+The storage client is created on first use (or by the startup warm-up, see
+startup.py), so importing the app never loads the Cloudinary SDK.
+
+The workers also render resized variants (see IMAGE_VARIANT_SIZES) as JPEG
+and WebP and store their URLs in `items.image_variants`, so catalog cards
+can load a few-KB thumbnail instead of the original upload.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+from sqlalchemy import text
+
+from cache_sync import broadcast_invalidation
+from catalog_cache import catalog_cache
+from events import publish_event, write_transaction
+from metrics import IMAGE_UPLOAD_DURATION
+
+logger = logging.getLogger("fibo.images")
+
+IMAGE_STORAGE = os.getenv("IMAGE_STORAGE", "cloudinary").lower()
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8000")
+IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", "4"))
+# Simulated upload time of the stub storage, roughly a Cloudinary round trip
+IMAGE_STUB_LATENCY_MS = float(os.getenv("IMAGE_STUB_LATENCY_MS", "300"))
+
+# Longest edge in pixels: thumb for the cart and admin tables, medium for
+# catalog cards (sized for 2x screens)
+IMAGE_VARIANT_SIZES = {"thumb": 160, "medium": 640}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+class ImageStorage(ABC):
+    """Stores image bytes and returns a public URL."""
+
+    @abstractmethod
+    def save(self, data: bytes, filename: str, content_type: str = None) -> str:
+        ...
+
+
+class CloudinaryStorage(ImageStorage):
+    def __init__(self):
+        import cloudinary
+
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+        )
+
+    def save(self, data: bytes, filename: str, content_type: str = None) -> str:
+        import cloudinary.uploader
+
+        upload_result = cloudinary.uploader.upload(io.BytesIO(data))
+        return upload_result.get("secure_url")
+
+
+class LocalStorage(ImageStorage):
+    def __init__(self, directory: str = UPLOAD_DIR, base_url: str = BASE_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, data: bytes, filename: str, content_type: str = None) -> str:
+        # Generate unique filename, keep the original extension
+        file_extension = os.path.splitext(filename or "")[1].lower()
+        new_filename = f"{uuid.uuid4()}{file_extension}"
+        with open(os.path.join(self.directory, new_filename), "wb") as file_object:
+            file_object.write(data)
+        return f"{self.base_url}/static/{new_filename}"
+
+
+class StubStorage(ImageStorage):
+    def __init__(self, latency_ms: float = IMAGE_STUB_LATENCY_MS):
+        self.latency = latency_ms / 1000
+
+    def save(self, data: bytes, filename: str, content_type: str = None) -> str:
+        time.sleep(self.latency)
+        file_extension = os.path.splitext(filename or "")[1].lower()
+        return f"https://stub.invalid/{uuid.uuid4()}{file_extension}"
+
+
+IMAGE_STORAGES = {"cloudinary": CloudinaryStorage, "local": LocalStorage, "stub": StubStorage}
+
+# Fail at import on a typo rather than at the first upload
+if IMAGE_STORAGE not in IMAGE_STORAGES:
+    raise ValueError(f"Unknown IMAGE_STORAGE: {IMAGE_STORAGE}")
+
+
+def create_image_storage() -> ImageStorage:
+    return IMAGE_STORAGES[IMAGE_STORAGE]()
+
+
+_image_storage = None
+_image_storage_lock = threading.Lock()
+
+
+def get_image_storage() -> ImageStorage:
+    global _image_storage
+    if _image_storage is None:
+        with _image_storage_lock:
+            if _image_storage is None:
+                _image_storage = create_image_storage()
+    return _image_storage
+
+# Dedicated workers, so a burst of uploads never takes request threads.
+# Created on the first upload and discarded by shutdown_uploads()
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def render_variants(data: bytes):
+    """Return {variant_name: (bytes, extension, content_type)} for an upload."""
+    variants = {}
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        for name, size in IMAGE_VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+            variants[f"{name}_webp"] = (buffer.getvalue(), ".webp", "image/webp")
+
+            # JPEG has no alpha channel, flatten transparent PNGs onto white
+            if has_alpha:
+                flattened = Image.new("RGB", resized.size, (255, 255, 255))
+                flattened.paste(resized, mask=resized.getchannel("A"))
+                resized = flattened
+            buffer = io.BytesIO()
+            resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            variants[name] = (buffer.getvalue(), ".jpg", "image/jpeg")
+    return variants
+
+
+def process_item_image(item_id: int, data, filename: str, content_type: str = None, notify: bool = True):
+    """
+    Upload one item image and record the result. With notify=False the caller
+    publishes the change and invalidates the catalog itself, once for many
+    images (bulk imports).
+    """
+    try:
+        # Bulk imports pass a loader so queued jobs don't hold image bytes
+        if callable(data):
+            data = data()
+        image_storage = get_image_storage()
+        with IMAGE_UPLOAD_DURATION.labels(IMAGE_STORAGE, "original").time():
+            image_url = image_storage.save(data, filename, content_type)
+
+        variant_urls = {}
+        try:
+            for name, (variant_data, extension, variant_type) in render_variants(data).items():
+                with IMAGE_UPLOAD_DURATION.labels(IMAGE_STORAGE, "variant").time():
+                    variant_urls[name] = image_storage.save(variant_data, f"{name}{extension}", variant_type)
+        except Exception:
+            # Not fatal: cards fall back to image_url
+            logger.exception("Could not render image variants for item %s", item_id)
+    except Exception:
+        logger.exception("Image upload failed for item %s", item_id)
+        with write_transaction() as connection:
+            failed = connection.execute(text("""
+                UPDATE items SET image_status = 'failed' WHERE item_id = :id
+            """), {"id": item_id}).rowcount
+            if failed and notify:
+                publish_event(connection, "item.updated", {"item_id": item_id, "image_status": "failed"})
+                broadcast_invalidation(connection, "catalog")
+        if notify:
+            catalog_cache.invalidate()
+        return
+
+    with write_transaction() as connection:
+        updated = connection.execute(text("""
+            UPDATE items
+            SET image_url = :image_url, image_variants = :variants, image_status = 'ready'
+            WHERE item_id = :id
+        """), {"id": item_id, "image_url": image_url, "variants": json.dumps(variant_urls)}).rowcount
+        if updated and notify:
+            publish_event(connection, "item.updated", {
+                "item_id": item_id, "image_status": "ready", "image_url": image_url, "image_variants": variant_urls
+            })
+            broadcast_invalidation(connection, "catalog")
+    if not updated:
+        logger.warning("Item %s was deleted before its image finished uploading", item_id)
+    if notify:
+        catalog_cache.invalidate()
+    logger.info("Image for item %s uploaded to %s", item_id, image_url)
+
+
+def schedule_item_image(item_id: int, data, filename: str, content_type: str = None, notify: bool = True):
+    """Queue an upload for `item_id`; `data` is bytes or a callable returning them."""
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ThreadPoolExecutor(max_workers=IMAGE_UPLOAD_WORKERS, thread_name_prefix="image-upload")
+        return _upload_executor.submit(process_item_image, item_id, data, filename, content_type, notify)
+
+
+def shutdown_uploads():
+    global _upload_executor
+    with _upload_executor_lock:
+        executor, _upload_executor = _upload_executor, None
+    if executor is not None:
+        # Let queued uploads finish so no item is left pending across a restart
+        executor.shutdown(wait=True)
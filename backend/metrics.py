@@ -0,0 +1,209 @@
+"""
+Prometheus metrics for the API, served on GET /metrics.
+
+- fibo_http_request_duration_seconds{method, route, status}: latency per
+  route template (/items/{item_id}, not the raw path)
+- fibo_db_queries_per_request{route}: SQL round trips per request, so an
+  N+1 loop shows up as a fat right tail; also sent as X-Query-Count,
+  except on streamed responses, whose queries run after the headers go out
+- fibo_db_query_duration_seconds{statement}: time per query by verb
+- fibo_db_pool_wait_seconds: time spent waiting for a pooled connection,
+  plus gauges for the connections checked out / in the pool
+- fibo_db_reads_total{target}: read connections served by a replica, by the
+  primary, or by the primary after a replica failed ("fallback")
+- fibo_db_replica_up{replica}: 1 while a read replica is in rotation
+- fibo_image_upload_seconds{storage, kind}: image storage uploads
+- fibo_http_rejected_total{reason}: requests turned away by ratelimit.py,
+  by rate limit rule or load shedding reason
+
+Queries slower than SLOW_QUERY_MS are logged with the route that ran them.
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates every worker (the pool gauges are then left out).
+"""
+import contextvars
+import logging
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger("fibo.metrics")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+
+# Long-lived streams would only skew the latency histogram
+UNTIMED_ROUTES = {"/metrics", "/events"}
+
+REQUEST_DURATION = Histogram(
+    "fibo_http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "fibo_http_requests_in_progress", "Requests being served", multiprocess_mode="livesum"
+)
+QUERIES_PER_REQUEST = Histogram(
+    "fibo_db_queries_per_request", "SQL statements executed per request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+QUERY_DURATION = Histogram(
+    "fibo_db_query_duration_seconds", "SQL statement latency", ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SLOW_QUERIES = Counter("fibo_db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["route"])
+POOL_WAIT = Histogram(
+    "fibo_db_pool_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_READS = Counter("fibo_db_reads_total", "Read connections by where they were served", ["target"])
+REPLICA_UP = Gauge("fibo_db_replica_up", "Read replica in rotation", ["replica"], multiprocess_mode="livemin")
+REJECTED = Counter("fibo_http_rejected_total", "Requests rejected by rate limiting or load shedding", ["reason"])
+IMAGE_UPLOAD_DURATION = Histogram(
+    "fibo_image_upload_seconds", "Image storage upload time", ["storage", "kind"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+STATEMENT_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+class RequestStats:
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+
+    @property
+    def route(self) -> str:
+        # The router records the matched route in the shared scope
+        return route_template(self.scope)
+
+
+# Set per request by MetricsMiddleware; sync endpoints see it too because
+# the threadpool copies the context into the worker thread
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_with_query_count(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                # Without a Content-Length the body is streamed and its
+                # queries are still to come: a count now would read 0
+                if message["status"] in (204, 304) or any(name == b"content-length" for name, _ in headers):
+                    headers.append((b"x-query-count", str(stats.queries).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_query_count)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            current_request.reset(token)
+            route = route_template(scope)
+            if route not in UNTIMED_ROUTES:
+                REQUEST_DURATION.labels(scope["method"], route, str(status["code"])).observe(
+                    time.perf_counter() - started
+                )
+                QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+
+
+class RecentPoolWait:
+    """
+    Moving average of recent checkout waits, for load shedding. Unlocked:
+    a racing update loses one sample, which an average can afford.
+    """
+
+    # Weight of the newest sample
+    ALPHA = 0.2
+
+    def __init__(self):
+        self.average = 0.0
+        self.updated = 0.0
+
+    def observe(self, seconds: float):
+        self.average += self.ALPHA * (seconds - self.average)
+        self.updated = time.monotonic()
+
+
+pool_wait = RecentPoolWait()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            POOL_WAIT.observe(waited)
+            pool_wait.observe(waited)
+
+
+def instrument_engine(engine, pool_gauges: bool = True):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        QUERY_DURATION.labels(verb if verb in STATEMENT_VERBS else "OTHER").observe(elapsed)
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            route = stats.route if stats else "background"
+            SLOW_QUERIES.labels(route).inc()
+            logger.warning("Slow query (%.0f ms, %s): %s", elapsed * 1000, route, " ".join(statement.split())[:500])
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_query_timer(context):
+        # after_cursor_execute never fires for a failed statement
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    if not pool_gauges or "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Callback gauges cannot be shared between processes
+        return
+    # Looked up on each scrape: engine.dispose() replaces the pool
+    Gauge("fibo_db_pool_checked_out", "Connections in use").set_function(lambda: engine.pool.checkedout())
+    Gauge("fibo_db_pool_size", "Connections kept open by the pool").set_function(lambda: engine.pool.size())
+
+
+def render_metrics():
+    """Return (body, content_type) for the /metrics endpoint."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,187 @@
+"""
+Versioned schema migrations.
+
+Applies the SQL files in migrations/ (NNNN_name.sql) in order and records
+each one in the schema_migrations table, so every database, local or Neon,
+can be brought up to date with one command:
+
+    python migrate.py                # apply pending migrations
+    python migrate.py status         # list applied / pending
+    python migrate.py --database-url postgresql://postgres@localhost/fibo_store_db
+
+Each file runs in its own transaction. A file whose first line is
+`-- migrate: no-transaction` runs statement by statement in autocommit
+instead, which CREATE INDEX CONCURRENTLY requires; its statements must end
+with `;` at the end of a line. Migrations are written to be idempotent, so a
+database created by the old scripts simply has the existing objects skipped.
+An applied migration must never be edited: migrate.py refuses to run while a
+file no longer matches the checksum recorded for it; put the change in a new
+migration instead.
+A session advisory lock keeps two deploys from migrating at the same time.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+CREATE_INDEX_PATTERN = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE
+)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+# Arbitrary key for pg_advisory_lock, shared by every migrate.py run
+MIGRATION_LOCK_KEY = 7_340_033
+
+CREATE_VERSION_TABLE_SQL = text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    VARCHAR(4) PRIMARY KEY,
+        name       TEXT NOT NULL,
+        checksum   TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+""")
+
+
+class Migration:
+    def __init__(self, path: str):
+        self.path = path
+        self.version, self.name = MIGRATION_FILE_PATTERN.match(os.path.basename(path)).groups()
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+    def statements(self):
+        # Only used for no-transaction files, which hold plain statements
+        statement = []
+        for line in self.sql.splitlines():
+            if not statement and (not line.strip() or line.lstrip().startswith("--")):
+                continue
+            statement.append(line)
+            if line.rstrip().endswith(";"):
+                yield "\n".join(statement)
+                statement = []
+        if "".join(statement).strip():
+            yield "\n".join(statement)
+
+    def index_names(self):
+        """Names of the indexes this migration creates."""
+        return CREATE_INDEX_PATTERN.findall(self.sql)
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR):
+    migrations = [
+        Migration(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if MIGRATION_FILE_PATTERN.match(name)
+    ]
+    versions = [m.version for m in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise SystemExit(f"Duplicate migration versions: {', '.join(duplicates)}")
+    return migrations
+
+
+def applied_migrations(connection):
+    connection.execute(CREATE_VERSION_TABLE_SQL)
+    rows = connection.execute(text("SELECT version, checksum FROM schema_migrations"))
+    return {row.version: row.checksum for row in rows}
+
+
+def changed_migrations(migrations, applied):
+    """Those of `migrations` edited since they were applied (`applied`: version -> checksum)."""
+    return [m for m in migrations if applied.get(m.version, m.checksum) != m.checksum]
+
+
+def invalid_indexes(connection, names):
+    """Those of the indexes `names` left invalid by a failed concurrent build."""
+    return connection.execute(text("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY(:names) AND pg_table_is_visible(c.oid)
+    """), {"names": list(names)}).scalars().all()
+
+
+def apply_migration(engine, migration: Migration):
+    if migration.transactional:
+        with engine.begin() as connection:
+            # Plain DBAPI execution: the files are full of ':' and '%'
+            connection.exec_driver_sql(migration.sql)
+            record_migration(connection, migration)
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for statement in migration.statements():
+            connection.exec_driver_sql(statement)
+        # A failed concurrent build leaves an invalid index that IF NOT EXISTS
+        # would then skip forever; refuse to record the migration over it.
+        # Invalid indexes this migration does not create are none of its business
+        broken = invalid_indexes(connection, migration.index_names())
+        if broken:
+            raise RuntimeError(
+                f"Invalid indexes after {migration.version}: {', '.join(broken)}. "
+                "Drop them with DROP INDEX CONCURRENTLY and run migrate.py again."
+            )
+        record_migration(connection, migration)
+
+
+def record_migration(connection, migration: Migration):
+    connection.execute(text("""
+        INSERT INTO schema_migrations (version, name, checksum)
+        VALUES (:version, :name, :checksum)
+    """), {"version": migration.version, "name": migration.name, "checksum": migration.checksum})
+
+
+def migrate(database_url: str, show_status: bool = False):
+    engine = create_engine(database_url, poolclass=NullPool)
+    migrations = load_migrations()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_connection:
+        lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            applied = applied_migrations(lock_connection)
+            pending = [m for m in migrations if m.version not in applied]
+
+            changed = changed_migrations(migrations, applied)
+            for migration in migrations:
+                if show_status or migration in changed:
+                    state = "pending" if migration.version not in applied else "applied"
+                    print(f"{migration.version} {migration.name}: {state}"
+                          f"{' (file changed since)' if migration in changed else ''}")
+            if show_status:
+                return 0
+            if changed:
+                raise SystemExit(
+                    f"Applied migrations changed since: {', '.join(m.version for m in changed)}. "
+                    "Restore them and put the change in a new migration."
+                )
+
+            for migration in pending:
+                print(f"Applying {migration.version} {migration.name} ...", flush=True)
+                apply_migration(engine, migration)
+            print("Database is up to date." if not pending else f"Applied {len(pending)} migration(s).")
+            return 0
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the SQL migrations in backend/migrations.")
+    parser.add_argument("command", nargs="?", choices=["up", "status"], default="up")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="defaults to DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("Set DATABASE_URL or pass --database-url")
+    database_url = args.database_url
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    sys.exit(migrate(database_url, show_status=args.command == "status"))
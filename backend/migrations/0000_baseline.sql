@@ -0,0 +1,58 @@
+-- Base tables, as the old init_cloud_db.py and fix_*.py scripts left them.
+-- Creates them on an empty database and brings an older one up to the same
+-- shape; existing tables and columns are left alone.
+
+CREATE TABLE IF NOT EXISTS items (
+    item_id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(100) DEFAULT 'General',
+    description TEXT,
+    image_url TEXT,
+    available_quantity INTEGER NOT NULL DEFAULT 0,
+    specifications JSONB DEFAULT '{}'::jsonb
+);
+
+-- Columns fix_db.py added to early local databases
+ALTER TABLE items ADD COLUMN IF NOT EXISTS description TEXT;
+ALTER TABLE items ADD COLUMN IF NOT EXISTS specifications JSONB DEFAULT '{}'::jsonb;
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    full_name VARCHAR(255),
+    role VARCHAR(50) DEFAULT 'Student',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id SERIAL PRIMARY KEY,
+    user_name VARCHAR(255),
+    pickup_date VARCHAR(50),
+    due_date VARCHAR(50),
+    purpose TEXT,
+    status VARCHAR(50) DEFAULT 'Pending'
+);
+
+-- The first cloud schema called due_date return_date (fix_due_date.py)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'bookings' AND column_name = 'return_date')
+       AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'bookings' AND column_name = 'due_date') THEN
+        ALTER TABLE bookings RENAME COLUMN return_date TO due_date;
+    END IF;
+END $$;
+
+-- Columns fix_users_table.py, fix_cloud_users.py and fix_cloud_bookings.py added
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS due_date VARCHAR(50);
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(user_id);
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS user_email VARCHAR(255);
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS booking_items (
+    id SERIAL PRIMARY KEY,
+    booking_id INTEGER REFERENCES bookings(booking_id),
+    item_id INTEGER REFERENCES items(item_id),
+    quantity INTEGER
+);
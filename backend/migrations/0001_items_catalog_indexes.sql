@@ -0,0 +1,11 @@
+-- Indexes behind the keyset-paginated /items listing.
+--
+-- The unfiltered listing walks the primary key backwards; these cover the
+-- category filter and the in-stock-only filter without a sort step.
+
+CREATE INDEX IF NOT EXISTS idx_items_category_item_id
+    ON items (category, item_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_items_in_stock_item_id
+    ON items (item_id DESC)
+    WHERE available_quantity > 0;
@@ -0,0 +1,21 @@
+-- Full-text and specification search for /items/search.
+--
+-- search_vector is a generated column, so every INSERT/UPDATE from
+-- create_item and update_item keeps it current without extra queries.
+-- The 'english' configuration stems plurals ("motors" matches "motor");
+-- Thai text is still indexed word by word.
+
+ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_items_search_vector
+    ON items USING GIN (search_vector);
+
+-- Default jsonb_ops supports both @> (equality filters) and ? (key
+-- existence, used to narrow numeric range filters).
+CREATE INDEX IF NOT EXISTS idx_items_specifications
+    ON items USING GIN (specifications);
@@ -0,0 +1,17 @@
+-- Indexes behind the paginated /admin/bookings feed and the status counts.
+
+-- Status tabs: keyset on booking_id within one status, and GROUP BY status
+CREATE INDEX IF NOT EXISTS idx_bookings_status_booking_id
+    ON bookings (status, booking_id DESC);
+
+-- Date range filter on pickup_date
+CREATE INDEX IF NOT EXISTS idx_bookings_pickup_date
+    ON bookings (pickup_date);
+
+-- Per-user filter
+CREATE INDEX IF NOT EXISTS idx_bookings_user_id_booking_id
+    ON bookings (user_id, booking_id DESC);
+
+-- Nesting the lines of each booking
+CREATE INDEX IF NOT EXISTS idx_booking_items_booking_id
+    ON booking_items (booking_id);
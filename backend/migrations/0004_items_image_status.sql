@@ -0,0 +1,3 @@
+-- Tracks the background image upload of each item: pending, ready or failed.
+
+ALTER TABLE items ADD COLUMN IF NOT EXISTS image_status VARCHAR(20) NOT NULL DEFAULT 'ready';
@@ -0,0 +1,4 @@
+-- URLs of the resized renditions of each item image, e.g.
+-- {"thumb": ".../x.jpg", "thumb_webp": ".../x.webp", "medium": ..., "medium_webp": ...}
+
+ALTER TABLE items ADD COLUMN IF NOT EXISTS image_variants JSONB NOT NULL DEFAULT '{}'::jsonb;
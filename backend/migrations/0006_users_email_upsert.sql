@@ -0,0 +1,32 @@
+-- Lets get_or_create_user upsert by email in one statement.
+
+-- ON CONFLICT (email) needs a unique index; databases created by 0000_baseline
+-- (or the old fix_users_table.py) already have users_email_key, so only add
+-- one if missing.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index ix
+        JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = ix.indkey[0]
+        WHERE ix.indrelid = 'users'::regclass
+          AND ix.indisunique AND ix.indnatts = 1 AND a.attname = 'email'
+    ) THEN
+        CREATE UNIQUE INDEX idx_users_email ON users (email);
+    END IF;
+END $$;
+
+-- user_id must come from a sequence instead of MAX(user_id) + 1
+DO $$
+BEGIN
+    IF pg_get_serial_sequence('users', 'user_id') IS NULL THEN
+        CREATE SEQUENCE IF NOT EXISTS users_user_id_seq OWNED BY users.user_id;
+        ALTER TABLE users ALTER COLUMN user_id SET DEFAULT nextval('users_user_id_seq');
+    END IF;
+    -- Rows inserted with MAX + 1 never advanced the sequence, catch it up
+    PERFORM setval(
+        pg_get_serial_sequence('users', 'user_id'),
+        COALESCE((SELECT MAX(user_id) FROM users), 0) + 1,
+        false
+    );
+END $$;
@@ -0,0 +1,149 @@
+-- Real date columns on bookings and the summary views behind /admin/analytics.
+
+-- pickup_date / due_date were VARCHAR(50) holding what <input type="date">
+-- sends (YYYY-MM-DD). Anything that does not parse is kept in
+-- bookings_legacy_dates before the column becomes DATE (and NULL).
+CREATE TABLE IF NOT EXISTS bookings_legacy_dates (
+    booking_id  INTEGER PRIMARY KEY,
+    pickup_date TEXT,
+    due_date    TEXT
+);
+
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'bookings' AND column_name = 'pickup_date') <> 'date' THEN
+        INSERT INTO bookings_legacy_dates (booking_id, pickup_date, due_date)
+        SELECT booking_id, pickup_date, due_date
+        FROM bookings
+        WHERE (pickup_date IS NOT NULL AND pickup_date !~ '^\s*\d{4}-\d{2}-\d{2}')
+           OR (due_date IS NOT NULL AND due_date !~ '^\s*\d{4}-\d{2}-\d{2}')
+        ON CONFLICT (booking_id) DO NOTHING;
+
+        -- Indexes on the old text column are rebuilt by ALTER TYPE
+        ALTER TABLE bookings
+            ALTER COLUMN pickup_date TYPE DATE USING (
+                CASE WHEN pickup_date ~ '^\s*\d{4}-\d{2}-\d{2}'
+                     THEN substring(pickup_date FROM '\d{4}-\d{2}-\d{2}')::date END
+            ),
+            ALTER COLUMN due_date TYPE DATE USING (
+                CASE WHEN due_date ~ '^\s*\d{4}-\d{2}-\d{2}'
+                     THEN substring(due_date FROM '\d{4}-\d{2}-\d{2}')::date END
+            );
+    END IF;
+END $$;
+
+-- When a booking actually went out and came back, for loan durations
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS approved_at TIMESTAMP;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS returned_at TIMESTAMP;
+
+-- Overdue list: only Approved bookings can be overdue, scanned by due_date
+CREATE INDEX IF NOT EXISTS idx_bookings_approved_due_date
+    ON bookings (due_date) WHERE status = 'Approved';
+
+-- Per-item demand. Rejected bookings never left the shelf and are not counted.
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_item_demand AS
+SELECT i.item_id,
+       i.name,
+       COALESCE(i.category, 'General') AS category,
+       i.available_quantity,
+       COUNT(DISTINCT lines.booking_id) AS bookings,
+       COALESCE(SUM(lines.quantity), 0) AS units_booked,
+       COALESCE(SUM(lines.quantity) FILTER (WHERE lines.status = 'Pending'), 0) AS units_pending,
+       COALESCE(SUM(lines.quantity) FILTER (WHERE lines.status = 'Approved'), 0) AS units_on_loan,
+       MAX(lines.created_at) AS last_booked_at,
+       now() AS refreshed_at
+FROM items i
+LEFT JOIN (
+    SELECT bi.item_id, bi.booking_id, bi.quantity, b.status, b.created_at
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    WHERE b.status <> 'Rejected'
+) lines ON lines.item_id = i.item_id
+GROUP BY i.item_id;
+
+-- REFRESH ... CONCURRENTLY needs a unique index
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_item_demand_item_id
+    ON analytics_item_demand (item_id);
+CREATE INDEX IF NOT EXISTS idx_analytics_item_demand_units_booked
+    ON analytics_item_demand (units_booked DESC, item_id);
+
+-- Per-category utilization and loan durations. Planned days come from the
+-- booking form; actual days from pickup to the Returned transition.
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_category_stats AS
+WITH stock AS (
+    SELECT COALESCE(category, 'General') AS category,
+           COUNT(*) AS items,
+           SUM(available_quantity) AS units_available
+    FROM items
+    GROUP BY 1
+),
+lines AS (
+    SELECT COALESCE(i.category, 'General') AS category, b.booking_id, b.status,
+           bi.quantity, b.pickup_date, b.due_date, b.returned_at
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    JOIN items i ON i.item_id = bi.item_id
+    WHERE b.status <> 'Rejected'
+),
+loans AS (
+    -- One row per booking and category, so multi-line bookings count once
+    SELECT DISTINCT category, booking_id, status, pickup_date, due_date, returned_at
+    FROM lines
+),
+usage AS (
+    SELECT category,
+           SUM(quantity) FILTER (WHERE status = 'Pending') AS units_pending,
+           SUM(quantity) FILTER (WHERE status = 'Approved') AS units_on_loan
+    FROM lines
+    GROUP BY category
+),
+durations AS (
+    SELECT category,
+           COUNT(*) AS bookings,
+           COUNT(*) FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS returned_bookings,
+           AVG(due_date - pickup_date) AS avg_planned_days,
+           AVG(returned_at::date - pickup_date)
+               FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS avg_actual_days
+    FROM loans
+    GROUP BY category
+)
+SELECT stock.category,
+       stock.items,
+       stock.units_available,
+       COALESCE(usage.units_pending, 0) AS units_pending,
+       COALESCE(usage.units_on_loan, 0) AS units_on_loan,
+       -- Share of the category's stock that is out on loan right now
+       ROUND(COALESCE(usage.units_on_loan, 0)::numeric / NULLIF(
+           stock.units_available + COALESCE(usage.units_pending, 0) + COALESCE(usage.units_on_loan, 0), 0
+       ), 4) AS utilization,
+       COALESCE(durations.bookings, 0) AS bookings,
+       COALESCE(durations.returned_bookings, 0) AS returned_bookings,
+       ROUND(durations.avg_planned_days, 2) AS avg_planned_days,
+       ROUND(durations.avg_actual_days, 2) AS avg_actual_days,
+       now() AS refreshed_at
+FROM stock
+LEFT JOIN usage ON usage.category = stock.category
+LEFT JOIN durations ON durations.category = stock.category;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_category_stats_category
+    ON analytics_category_stats (category);
+
+-- Whole-store loan durations (not derivable from the per-category rows,
+-- since one booking can span categories)
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_loan_summary AS
+SELECT 1 AS id,
+       COUNT(*) AS bookings,
+       COUNT(*) FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS returned_bookings,
+       ROUND(AVG(due_date - pickup_date), 2) AS avg_planned_days,
+       ROUND(AVG(returned_at::date - pickup_date)
+           FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL), 2) AS avg_actual_days,
+       ROUND(AVG(EXTRACT(EPOCH FROM approved_at - created_at) / 3600)
+           FILTER (WHERE approved_at IS NOT NULL), 2) AS avg_hours_to_approval,
+       now() AS refreshed_at
+FROM bookings
+WHERE status <> 'Rejected';
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_loan_summary_id
+    ON analytics_loan_summary (id);
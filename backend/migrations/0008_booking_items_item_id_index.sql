@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- booking_items by item: restocking, the analytics views, and the foreign key
+-- check when an item is deleted all look lines up by item_id.
+--
+-- Built CONCURRENTLY so bookings keep flowing while it builds on a large
+-- table. If the build fails it leaves an INVALID index behind: drop it with
+-- DROP INDEX CONCURRENTLY idx_booking_items_item_id; and run migrate.py again.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_booking_items_item_id
+    ON booking_items (item_id);
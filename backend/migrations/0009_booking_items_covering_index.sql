@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- /my-bookings and the admin feed nest each booking's lines in line order.
+-- With (booking_id, id) INCLUDE (item_id, quantity) that lookup is an
+-- index-only scan instead of a heap visit per line, and it replaces the
+-- plain booking_id index from 0003, which it fully covers.
+--
+-- If the build fails, drop the INVALID index with
+-- DROP INDEX CONCURRENTLY idx_booking_items_booking_id_covering; and run migrate.py again.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_booking_items_booking_id_covering
+    ON booking_items (booking_id, id) INCLUDE (item_id, quantity);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_booking_items_booking_id;
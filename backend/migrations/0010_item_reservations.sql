@@ -0,0 +1,57 @@
+-- Time-window reservations (see reservations.py).
+
+-- Units the store owns. available_quantity becomes "free today": the total
+-- minus what reservations hold today. Existing stock was decremented for
+-- every open booking, so the total is what is on the shelf plus those.
+ALTER TABLE items ADD COLUMN IF NOT EXISTS total_quantity INTEGER;
+
+UPDATE items i
+SET total_quantity = i.available_quantity + COALESCE((
+    SELECT SUM(bi.quantity)
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    WHERE bi.item_id = i.item_id AND b.status IN ('Pending', 'Approved')
+), 0)
+WHERE i.total_quantity IS NULL;
+
+ALTER TABLE items ALTER COLUMN total_quantity SET NOT NULL;
+
+-- One row per line of every open booking (Pending or Approved), removed when
+-- the booking is Rejected or Returned. `period` is [pickup_date, due_date];
+-- a missing date leaves that side unbounded.
+CREATE TABLE IF NOT EXISTS item_reservations (
+    reservation_id SERIAL PRIMARY KEY,
+    booking_id     INTEGER NOT NULL REFERENCES bookings(booking_id),
+    item_id        INTEGER NOT NULL REFERENCES items(item_id),
+    quantity       INTEGER NOT NULL CHECK (quantity > 0),
+    period         DATERANGE NOT NULL
+);
+
+INSERT INTO item_reservations (booking_id, item_id, quantity, period)
+SELECT bi.booking_id, bi.item_id, bi.quantity,
+       daterange(b.pickup_date,
+                 CASE WHEN b.due_date < b.pickup_date THEN b.pickup_date ELSE b.due_date END, '[]')
+FROM booking_items bi
+JOIN bookings b ON b.booking_id = bi.booking_id
+WHERE b.status IN ('Pending', 'Approved')
+  AND NOT EXISTS (SELECT 1 FROM item_reservations r WHERE r.booking_id = bi.booking_id);
+
+-- Availability of a few items: their live reservations are a short list
+CREATE INDEX IF NOT EXISTS idx_item_reservations_item_id
+    ON item_reservations (item_id);
+-- Releasing a booking's lines
+CREATE INDEX IF NOT EXISTS idx_item_reservations_booking_id
+    ON item_reservations (booking_id);
+-- Overlap (&&) scans across the catalog, e.g. everything out next week
+CREATE INDEX IF NOT EXISTS idx_item_reservations_period
+    ON item_reservations USING gist (period);
+
+-- Bookings for a later window no longer count against today
+UPDATE items i
+SET available_quantity = i.total_quantity - COALESCE((
+    SELECT SUM(r.quantity) FROM item_reservations r
+    WHERE r.item_id = i.item_id
+      AND (CASE WHEN upper(r.period) <= CURRENT_DATE
+                THEN daterange(lower(r.period), CURRENT_DATE, '[]')
+                ELSE r.period END) @> CURRENT_DATE
+), 0);
@@ -0,0 +1,19 @@
+-- Idempotency-Key store for booking writes (see idempotency.py).
+
+-- One row per key the API has completed a request for. `scope` is the
+-- endpoint ("POST /bookings", ...), so the same key may be reused across
+-- endpoints; `request_hash` ties the key to the request it was first sent
+-- with. The row is written in the same transaction as the booking change,
+-- so a stored response always belongs to a committed write.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope         VARCHAR(64)  NOT NULL,
+    key           VARCHAR(255) NOT NULL,
+    request_hash  CHAR(64)     NOT NULL,
+    status_code   SMALLINT,
+    response_body TEXT,
+    created_at    TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, key)
+);
+
+-- Expired keys are purged by age
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at);
@@ -0,0 +1,118 @@
+-- Overdue bookings (see overdue.py).
+
+-- The overdue list looks Overdue bookings up by due date; the sweep's side
+-- (Approved and past due) is covered by idx_bookings_approved_due_date.
+CREATE INDEX IF NOT EXISTS idx_bookings_overdue_due_date
+    ON bookings (due_date) WHERE status = 'Overdue';
+
+-- Outbox of messages to users. Rows are written in the same transaction as
+-- the change they report and sent later in batches; `sent_at` stays NULL
+-- until a sender accepted the message. One notification per kind and booking.
+CREATE TABLE IF NOT EXISTS notifications (
+    notification_id BIGSERIAL PRIMARY KEY,
+    kind            VARCHAR(32)  NOT NULL,
+    booking_id      INTEGER      NOT NULL REFERENCES bookings(booking_id),
+    recipient       VARCHAR(255) NOT NULL,
+    payload         JSONB        NOT NULL,
+    created_at      TIMESTAMPTZ  NOT NULL DEFAULT now(),
+    sent_at         TIMESTAMPTZ,
+    attempts        INTEGER      NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    UNIQUE (kind, booking_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_unsent
+    ON notifications (notification_id) WHERE sent_at IS NULL;
+
+-- An Overdue loan is still out: count it with the Approved ones. The views
+-- are as in 0007 otherwise.
+DROP MATERIALIZED VIEW IF EXISTS analytics_item_demand;
+DROP MATERIALIZED VIEW IF EXISTS analytics_category_stats;
+
+-- Per-item demand. Rejected bookings never left the shelf and are not counted.
+CREATE MATERIALIZED VIEW analytics_item_demand AS
+SELECT i.item_id,
+       i.name,
+       COALESCE(i.category, 'General') AS category,
+       i.available_quantity,
+       COUNT(DISTINCT lines.booking_id) AS bookings,
+       COALESCE(SUM(lines.quantity), 0) AS units_booked,
+       COALESCE(SUM(lines.quantity) FILTER (WHERE lines.status = 'Pending'), 0) AS units_pending,
+       COALESCE(SUM(lines.quantity) FILTER (WHERE lines.status IN ('Approved', 'Overdue')), 0) AS units_on_loan,
+       MAX(lines.created_at) AS last_booked_at,
+       now() AS refreshed_at
+FROM items i
+LEFT JOIN (
+    SELECT bi.item_id, bi.booking_id, bi.quantity, b.status, b.created_at
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    WHERE b.status <> 'Rejected'
+) lines ON lines.item_id = i.item_id
+GROUP BY i.item_id;
+
+-- REFRESH ... CONCURRENTLY needs a unique index
+CREATE UNIQUE INDEX idx_analytics_item_demand_item_id
+    ON analytics_item_demand (item_id);
+CREATE INDEX idx_analytics_item_demand_units_booked
+    ON analytics_item_demand (units_booked DESC, item_id);
+
+-- Per-category utilization and loan durations. Planned days come from the
+-- booking form; actual days from pickup to the Returned transition.
+CREATE MATERIALIZED VIEW analytics_category_stats AS
+WITH stock AS (
+    SELECT COALESCE(category, 'General') AS category,
+           COUNT(*) AS items,
+           SUM(available_quantity) AS units_available
+    FROM items
+    GROUP BY 1
+),
+lines AS (
+    SELECT COALESCE(i.category, 'General') AS category, b.booking_id, b.status,
+           bi.quantity, b.pickup_date, b.due_date, b.returned_at
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    JOIN items i ON i.item_id = bi.item_id
+    WHERE b.status <> 'Rejected'
+),
+loans AS (
+    -- One row per booking and category, so multi-line bookings count once
+    SELECT DISTINCT category, booking_id, status, pickup_date, due_date, returned_at
+    FROM lines
+),
+usage AS (
+    SELECT category,
+           SUM(quantity) FILTER (WHERE status = 'Pending') AS units_pending,
+           SUM(quantity) FILTER (WHERE status IN ('Approved', 'Overdue')) AS units_on_loan
+    FROM lines
+    GROUP BY category
+),
+durations AS (
+    SELECT category,
+           COUNT(*) AS bookings,
+           COUNT(*) FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS returned_bookings,
+           AVG(due_date - pickup_date) AS avg_planned_days,
+           AVG(returned_at::date - pickup_date)
+               FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS avg_actual_days
+    FROM loans
+    GROUP BY category
+)
+SELECT stock.category,
+       stock.items,
+       stock.units_available,
+       COALESCE(usage.units_pending, 0) AS units_pending,
+       COALESCE(usage.units_on_loan, 0) AS units_on_loan,
+       -- Share of the category's stock that is out on loan right now
+       ROUND(COALESCE(usage.units_on_loan, 0)::numeric / NULLIF(
+           stock.units_available + COALESCE(usage.units_pending, 0) + COALESCE(usage.units_on_loan, 0), 0
+       ), 4) AS utilization,
+       COALESCE(durations.bookings, 0) AS bookings,
+       COALESCE(durations.returned_bookings, 0) AS returned_bookings,
+       ROUND(durations.avg_planned_days, 2) AS avg_planned_days,
+       ROUND(durations.avg_actual_days, 2) AS avg_actual_days,
+       now() AS refreshed_at
+FROM stock
+LEFT JOIN usage ON usage.category = stock.category
+LEFT JOIN durations ON durations.category = stock.category;
+
+CREATE UNIQUE INDEX idx_analytics_category_stats_category
+    ON analytics_category_stats (category);
@@ -0,0 +1,70 @@
+-- Utilization as the share of a category's stock that is out today.
+--
+-- Since 0010, available_quantity is what is free today, with every
+-- reservation held today already subtracted, so adding the pending and on
+-- loan units back onto it counted them twice; and units_on_loan counted
+-- Approved bookings whose pickup is still to come. Both now come from the
+-- reservations ledger, counting what is held today (a past-due loan that is
+-- not back yet is held through today, as in reservations.py), and
+-- utilization is measured against the category's total stock.
+DROP MATERIALIZED VIEW IF EXISTS analytics_category_stats;
+
+CREATE MATERIALIZED VIEW analytics_category_stats AS
+WITH stock AS (
+    SELECT COALESCE(category, 'General') AS category,
+           COUNT(*) AS items,
+           SUM(total_quantity) AS units_total,
+           SUM(available_quantity) AS units_available
+    FROM items
+    GROUP BY 1
+),
+held AS (
+    SELECT COALESCE(i.category, 'General') AS category,
+           SUM(r.quantity) FILTER (WHERE b.status = 'Pending') AS units_pending,
+           SUM(r.quantity) FILTER (WHERE b.status IN ('Approved', 'Overdue')) AS units_on_loan
+    FROM item_reservations r
+    JOIN bookings b ON b.booking_id = r.booking_id
+    JOIN items i ON i.item_id = r.item_id
+    WHERE (CASE WHEN upper(r.period) <= CURRENT_DATE
+                THEN daterange(lower(r.period), CURRENT_DATE, '[]')
+                ELSE r.period END) @> CURRENT_DATE
+    GROUP BY 1
+),
+loans AS (
+    -- One row per booking and category, so multi-line bookings count once
+    SELECT DISTINCT COALESCE(i.category, 'General') AS category, b.booking_id, b.status,
+           b.pickup_date, b.due_date, b.returned_at
+    FROM booking_items bi
+    JOIN bookings b ON b.booking_id = bi.booking_id
+    JOIN items i ON i.item_id = bi.item_id
+    WHERE b.status <> 'Rejected'
+),
+durations AS (
+    SELECT category,
+           COUNT(*) AS bookings,
+           COUNT(*) FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS returned_bookings,
+           AVG(due_date - pickup_date) AS avg_planned_days,
+           AVG(returned_at::date - pickup_date)
+               FILTER (WHERE status = 'Returned' AND returned_at IS NOT NULL) AS avg_actual_days
+    FROM loans
+    GROUP BY category
+)
+SELECT stock.category,
+       stock.items,
+       stock.units_total,
+       stock.units_available,
+       COALESCE(held.units_pending, 0) AS units_pending,
+       COALESCE(held.units_on_loan, 0) AS units_on_loan,
+       -- Share of the category's stock that is out on loan today
+       ROUND(COALESCE(held.units_on_loan, 0)::numeric / NULLIF(stock.units_total, 0), 4) AS utilization,
+       COALESCE(durations.bookings, 0) AS bookings,
+       COALESCE(durations.returned_bookings, 0) AS returned_bookings,
+       ROUND(durations.avg_planned_days, 2) AS avg_planned_days,
+       ROUND(durations.avg_actual_days, 2) AS avg_actual_days,
+       now() AS refreshed_at
+FROM stock
+LEFT JOIN held ON held.category = stock.category
+LEFT JOIN durations ON durations.category = stock.category;
+
+CREATE UNIQUE INDEX idx_analytics_category_stats_category
+    ON analytics_category_stats (category);
@@ -0,0 +1,5 @@
+-- Notifications are claimed in one short transaction and marked sent or
+-- failed in another, with the sending in between (see notifications.py).
+-- `claimed_at` keeps other workers off a claimed row meanwhile; a claim
+-- older than NOTIFY_CLAIM_TIMEOUT was abandoned and the row is up for grabs.
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ;
@@ -0,0 +1,6 @@
+-- Caller-chosen item key for bulk imports (bulk_import.py): a manifest row
+-- with a sku updates the item that has it or creates it, so importing the
+-- same manifest twice does not duplicate the catalog. NULLs do not collide.
+ALTER TABLE items ADD COLUMN IF NOT EXISTS sku VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_items_sku ON items (sku);
@@ -0,0 +1,179 @@
+"""
+Notifications to users: an outbox table and pluggable senders.
+
+Code that has something to tell a user calls `enqueue_booking_notifications`
+inside its transaction, so a message exists only if the change it reports
+committed, and at most once per kind and booking. `dispatch_notifications`
+later claims unsent rows in a short transaction (FOR UPDATE SKIP LOCKED and
+a `claimed_at` stamp, so several workers can drain the outbox without
+sending anything twice), folds them into one message per recipient and
+hands those to the sender outside any transaction, then marks them sent or
+failed in a second short one. At most NOTIFY_BATCH_SIZE rows go out per
+call, paced to NOTIFY_RATE_PER_SECOND messages. A failed message stays in
+the outbox and is retried on later calls, up to NOTIFY_MAX_ATTEMPTS times;
+so is one whose claim is older than NOTIFY_CLAIM_TIMEOUT seconds, left
+behind by a worker that died while sending.
+
+NOTIFY_SENDER picks the sender: "log" (default) writes every message to the
+log and "file" appends them as JSON lines to NOTIFY_FILE, both meant for
+local testing. A mail or chat integration subclasses NotificationSender.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from sqlalchemy import text
+
+from db import engine
+
+logger = logging.getLogger("fibo.notifications")
+
+NOTIFY_SENDER = os.getenv("NOTIFY_SENDER", "log").lower()
+NOTIFY_FILE = os.getenv("NOTIFY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "notifications.jsonl"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "200"))
+NOTIFY_RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", "20"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+# Seconds after which an unfinished claim is abandoned; well above a batch's sending time
+NOTIFY_CLAIM_TIMEOUT = float(os.getenv("NOTIFY_CLAIM_TIMEOUT", "600"))
+
+# One row per booking, with what a reminder needs to say
+ENQUEUE_SQL = text("""
+    INSERT INTO notifications (kind, booking_id, recipient, payload)
+    SELECT :kind, b.booking_id, u.email,
+           jsonb_build_object(
+               'booking_id', b.booking_id,
+               'user_name', u.full_name,
+               'pickup_date', b.pickup_date,
+               'due_date', b.due_date,
+               'items', COALESCE(lines.items, '[]'::jsonb)
+           )
+    FROM bookings b
+    JOIN users u ON u.user_id = b.user_id
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object('name', i.name, 'quantity', bi.quantity) ORDER BY bi.id) AS items
+        FROM booking_items bi
+        JOIN items i ON i.item_id = bi.item_id
+        WHERE bi.booking_id = b.booking_id
+    ) lines ON true
+    WHERE b.booking_id = ANY(CAST(:booking_ids AS integer[]))
+    ON CONFLICT (kind, booking_id) DO NOTHING
+""")
+
+# Counts the attempt up front, so a message that takes its sender down
+# still runs out of attempts
+CLAIM_SQL = text("""
+    UPDATE notifications n
+    SET claimed_at = now(), attempts = n.attempts + 1
+    FROM (
+        SELECT notification_id
+        FROM notifications
+        WHERE sent_at IS NULL AND attempts < :max_attempts
+          AND (claimed_at IS NULL OR claimed_at < now() - make_interval(secs => :claim_timeout))
+        ORDER BY notification_id
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ) claimed
+    WHERE n.notification_id = claimed.notification_id
+    RETURNING n.notification_id, n.kind, n.recipient, n.payload
+""")
+
+MARK_SENT_SQL = text("""
+    UPDATE notifications
+    SET sent_at = now(), claimed_at = NULL, last_error = NULL
+    WHERE notification_id = ANY(CAST(:ids AS bigint[]))
+""")
+
+MARK_FAILED_SQL = text("""
+    UPDATE notifications
+    SET claimed_at = NULL, last_error = :error
+    WHERE notification_id = ANY(CAST(:ids AS bigint[]))
+""")
+
+
+class NotificationSender(ABC):
+    """
+    Delivers one message: {"recipient", "kind", "bookings": [payload, ...]}.
+    Raising leaves the message in the outbox to be retried.
+    """
+
+    @abstractmethod
+    def send(self, message: dict):
+        ...
+
+
+class LogSender(NotificationSender):
+    def send(self, message: dict):
+        booking_ids = ", ".join(str(booking["booking_id"]) for booking in message["bookings"])
+        logger.info("Notify %s (%s): bookings %s", message["recipient"], message["kind"], booking_ids)
+
+
+class FileSender(NotificationSender):
+    def __init__(self, path: str = NOTIFY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, message: dict):
+        line = json.dumps(message, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as file_object:
+            file_object.write(line)
+
+
+def create_sender() -> NotificationSender:
+    if NOTIFY_SENDER == "log":
+        return LogSender()
+    if NOTIFY_SENDER == "file":
+        return FileSender()
+    raise ValueError(f"Unknown NOTIFY_SENDER: {NOTIFY_SENDER}")
+
+
+sender = create_sender()
+
+
+def enqueue_booking_notifications(connection, kind: str, booking_ids):
+    """Queue a `kind` notification for each booking, inside the caller's transaction."""
+    if not booking_ids:
+        return 0
+    return connection.execute(ENQUEUE_SQL, {"kind": kind, "booking_ids": list(booking_ids)}).rowcount
+
+
+def dispatch_notifications(limit: int = NOTIFY_BATCH_SIZE):
+    """Send up to `limit` queued notifications; returns (sent, failed) row counts."""
+    with engine.begin() as connection:
+        rows = connection.execute(CLAIM_SQL, {
+            "max_attempts": NOTIFY_MAX_ATTEMPTS, "claim_timeout": NOTIFY_CLAIM_TIMEOUT, "limit": limit
+        }).fetchall()
+    if not rows:
+        return 0, 0
+
+    # One message per recipient and kind, however many bookings it covers
+    messages = {}
+    for row in sorted(rows, key=lambda row: row.notification_id):
+        message = messages.setdefault((row.recipient, row.kind), {
+            "recipient": row.recipient, "kind": row.kind, "bookings": [], "ids": []
+        })
+        message["bookings"].append(row.payload)
+        message["ids"].append(row.notification_id)
+
+    # No transaction (nor pooled connection) is held while sending and pacing
+    sent, failed = [], []
+    interval = 1 / NOTIFY_RATE_PER_SECOND if NOTIFY_RATE_PER_SECOND > 0 else 0
+    for message in messages.values():
+        started = time.monotonic()
+        ids = message.pop("ids")
+        try:
+            sender.send(message)
+            sent += ids
+        except Exception as e:
+            logger.warning("Could not notify %s: %s", message["recipient"], e)
+            failed.append((ids, str(e)[:500]))
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    with engine.begin() as connection:
+        if sent:
+            connection.execute(MARK_SENT_SQL, {"ids": sent})
+        for ids, error in failed:
+            connection.execute(MARK_FAILED_SQL, {"ids": ids, "error": error})
+    return len(sent), sum(len(ids) for ids, _ in failed)
@@ -0,0 +1,140 @@
+"""
+Overdue loans and their reminders.
+
+Every OVERDUE_SWEEP_INTERVAL seconds `sweep_overdue` takes the Approved
+bookings whose due_date has passed (idx_bookings_approved_due_date, oldest
+first, at most OVERDUE_BATCH_SIZE per tick), moves them to Overdue with one
+set-based transition and queues an "overdue" notification for each, all in
+one transaction. `dispatch_notifications` then sends a batch of queued
+reminders (notifications.py). A backlog, such as the first sweep over old
+data, drains a batch per tick instead of in one long transaction.
+
+The sweep holds an advisory lock and skips rows another transaction has
+locked, so any number of workers can run it: the one that gets the lock
+does the work and the others skip the tick. The scheduler runs inside the
+API process by default; set OVERDUE_SWEEP_INTERVAL=0 there and run
+`python overdue.py` to keep it in a worker of its own (with
+EVENTS_BACKEND=postgres on the API, so its caches hear about the changes).
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from analytics import mark_analytics_dirty
+from booking_transitions import apply_transition
+from cache_sync import broadcast_invalidation, invalidate_local
+from events import write_transaction
+from notifications import dispatch_notifications, enqueue_booking_notifications
+
+logger = logging.getLogger("fibo.overdue")
+
+OVERDUE_SWEEP_INTERVAL = float(os.getenv("OVERDUE_SWEEP_INTERVAL", "60"))
+OVERDUE_BATCH_SIZE = int(os.getenv("OVERDUE_BATCH_SIZE", "500"))
+
+# Arbitrary key shared by every worker for pg_try_advisory_xact_lock
+SWEEP_LOCK_KEY = 4_815_163
+
+PAST_DUE_SQL = text("""
+    SELECT booking_id
+    FROM bookings
+    WHERE status = 'Approved' AND due_date < CURRENT_DATE
+    ORDER BY due_date, booking_id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+
+def sweep_overdue(limit: int = OVERDUE_BATCH_SIZE):
+    """Mark up to `limit` past-due Approved bookings Overdue; returns their ids."""
+    with write_transaction() as connection:
+        if not connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SWEEP_LOCK_KEY}).scalar():
+            return []
+        booking_ids = connection.execute(PAST_DUE_SQL, {"limit": limit}).scalars().all()
+        if not booking_ids:
+            return []
+        report = apply_transition(connection, booking_ids, "Overdue")
+        user_emails = report.pop("user_emails")
+        enqueue_booking_notifications(connection, "overdue", report["updated"])
+        broadcast_invalidation(connection, "history", user_emails)
+    invalidate_local("history", user_emails)
+    if report["updated"]:
+        mark_analytics_dirty()
+    return report["updated"]
+
+
+def run_tick():
+    """One scheduler tick: a sweep, then a batch of notifications."""
+    started = time.perf_counter()
+    overdue = sweep_overdue()
+    sent, failed = dispatch_notifications()
+    if overdue or sent or failed:
+        logger.info(
+            "Marked %d bookings overdue, sent %d notifications (%d failed) in %.0f ms",
+            len(overdue), sent, failed, (time.perf_counter() - started) * 1000
+        )
+    return overdue, sent
+
+
+class OverdueScheduler(threading.Thread):
+    def __init__(self, interval: float = OVERDUE_SWEEP_INTERVAL):
+        super().__init__(name="overdue-scheduler", daemon=True)
+        self.interval = interval
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                run_tick()
+            except Exception:
+                logger.exception("Overdue sweep failed")
+
+
+# The running scheduler, between start_overdue() and stop_overdue()
+_scheduler = None
+
+
+def start_overdue():
+    global _scheduler
+    if OVERDUE_SWEEP_INTERVAL > 0:
+        _scheduler = OverdueScheduler()
+        _scheduler.start()
+
+
+def stop_overdue():
+    global _scheduler
+    scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.stop()
+        scheduler.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark past-due loans Overdue and send reminders.")
+    parser.add_argument("--once", action="store_true", help="Run until the backlog is drained, then exit")
+    parser.add_argument("--interval", type=float, default=OVERDUE_SWEEP_INTERVAL or 60,
+                        help="Seconds between ticks (default: OVERDUE_SWEEP_INTERVAL)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.once:
+        while any(run_tick()):
+            pass
+        return
+    scheduler = OverdueScheduler(args.interval)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
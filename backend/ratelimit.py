@@ -0,0 +1,252 @@
+"""
+Rate limiting and load shedding, in front of every endpoint.
+
+Rate limits: each client address gets a token bucket per endpoint group in
+RATE_LIMIT_RULES, refilled at the group's rate up to its burst. A request
+that finds its bucket empty gets 429 with a Retry-After of when the next
+token arrives. RATE_LIMITS overrides the defaults, e.g.
+"booking=20/100,catalog=50/200" (requests per second / burst).
+
+A whole campus can sit behind one NAT address, and every request reaches
+the app through the host's proxy, so the address limits are sized for many
+users sharing an IP. The client address is the X-Forwarded-For entry added
+by the outermost of RATE_LIMIT_TRUSTED_HOPS proxies (1 on Render; 0, the
+default, uses the peer address and ignores the header, which anyone can
+forge). On top of that, the routes that act for a user (booking, history)
+have a tighter bucket per user email, `Depends(limit_per_user(group))`,
+overridden with USER_RATE_LIMITS.
+
+Load shedding: a request that arrives while more than SHED_MAX_IN_FLIGHT are
+being served, or while every pooled connection is busy and recent checkouts
+waited more than SHED_POOL_WAIT_MS on average, gets 503 with Retry-After
+instead of joining a queue it would time out in.
+
+Buckets and counters are per worker process, so with N workers a client gets
+up to N times the limit; the point is to keep one client from starving the
+pool, not to meter exactly. Everything runs on the event loop, so the hot path
+takes no locks and costs a few microseconds (benchmarks/ratelimit_bench.py).
+"""
+import math
+import os
+import time
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from db import DB_MAX_OVERFLOW, DB_POOL_SIZE, THREADPOOL_SIZE
+from metrics import REJECTED, pool_wait
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Reverse proxies in front of the app that each append to X-Forwarded-For
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "0"))
+# Buckets kept per rule before idle ones are dropped
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", str(THREADPOOL_SIZE * 4)))
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", "250"))
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "1"))
+
+# Pool waits older than this say nothing about the pool now
+POOL_WAIT_WINDOW = 2.0
+
+# Requests per second and burst per endpoint group and client address
+DEFAULT_RATE_LIMITS = {
+    "catalog": (50, 200),
+    "history": (20, 100),
+    "booking": (10, 50),
+    "admin": (10, 40),
+    "export": (0.1, 3),
+    "events": (2, 20),
+    "default": (20, 60),
+}
+
+# Requests per second and burst per endpoint group and user email
+DEFAULT_USER_RATE_LIMITS = {
+    "history": (5, 20),
+    "booking": (1, 5),
+}
+
+# (group, method or None for any, path prefix); the first match wins
+RATE_LIMIT_RULES = [
+    ("export", "GET", "/admin/bookings/export"),
+    ("admin", None, "/admin/"),
+    ("history", "GET", "/my-bookings"),
+    ("booking", "POST", "/bookings"),
+    ("admin", None, "/bookings"),
+    ("catalog", "GET", "/items"),
+    ("admin", None, "/items"),
+    ("events", "GET", "/events"),
+]
+
+# Health checks and scrapes are never limited
+EXEMPT_PATHS = {"/", "/healthz", "/readyz", "/metrics"}
+
+# Long-lived streams, left out of the in-flight count
+STREAM_PATHS = {"/events"}
+
+
+def parse_rate_limits(spec: str, defaults: dict = DEFAULT_RATE_LIMITS) -> dict:
+    limits = dict(defaults)
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            name, value = entry.split("=")
+            rate, burst = (float(number) for number in value.split("/"))
+        except ValueError:
+            raise ValueError(f"Bad RATE_LIMITS entry {entry!r}, expected name=rate/burst")
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Bad RATE_LIMITS entry {entry!r}, rate must be positive and burst at least 1")
+        limits[name.strip()] = (rate, burst)
+    return limits
+
+
+RATE_LIMITS = parse_rate_limits(os.getenv("RATE_LIMITS", ""))
+USER_RATE_LIMITS = parse_rate_limits(os.getenv("USER_RATE_LIMITS", ""), DEFAULT_USER_RATE_LIMITS)
+
+
+class TokenBucketLimiter:
+    """Token buckets of one endpoint group, one per client."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> [tokens, monotonic time of the last update]
+        self._buckets = {}
+
+    def take(self, client: str, now: float) -> float:
+        """Take a token for `client`; returns 0, or the seconds until one is available."""
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._prune(now)
+            self._buckets[client] = [self.burst - 1, now]
+            return 0.0
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to be full again is the same as no bucket
+        refill = self.burst / self.rate
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items() if now - bucket[1] < refill
+        }
+        if len(self._buckets) >= self.max_clients:
+            # Every client is active: start over rather than grow without bound
+            self._buckets.clear()
+
+
+limiters = {name: TokenBucketLimiter(rate, burst) for name, (rate, burst) in RATE_LIMITS.items()}
+user_limiters = {name: TokenBucketLimiter(rate, burst) for name, (rate, burst) in USER_RATE_LIMITS.items()}
+
+
+def rule_for(method: str, path: str) -> str:
+    for name, rule_method, prefix in RATE_LIMIT_RULES:
+        if (rule_method is None or rule_method == method) and path.startswith(prefix):
+            return name
+    return "default"
+
+
+def client_address(scope, trusted_hops: int = RATE_LIMIT_TRUSTED_HOPS) -> str:
+    if trusted_hops:
+        forwarded = [
+            value.decode("latin-1") for name, value in scope["headers"] if name == b"x-forwarded-for"
+        ]
+        if forwarded:
+            hops = ",".join(forwarded).split(",")
+            # Each trusted proxy appended the address it saw, so the entry the
+            # outermost one added is the client; anything before it is forgeable
+            return hops[-min(trusted_hops, len(hops))].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def retry_after_header(retry_after: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code, headers=retry_after_header(retry_after))
+
+
+async def request_email(request: Request):
+    """The user a request acts for: ?email= or "user_email" in a JSON body."""
+    email = request.query_params.get("email")
+    if email is None and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            # FastAPI has already parsed the body for the endpoint; this is its cached copy
+            body = await request.json()
+        except ValueError:
+            return None
+        email = body.get("user_email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def limit_per_user(group: str, enabled: bool = RATE_LIMIT_ENABLED):
+    """Dependency limiting `group` per user email, on top of the per-address limit."""
+    async def check(request: Request):
+        if not enabled:
+            return
+        email = await request_email(request)
+        if email is None:
+            return
+        retry_after = user_limiters[group].take(email, time.monotonic())
+        if retry_after:
+            REJECTED.labels(f"user_{group}").inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers=retry_after_header(retry_after),
+            )
+
+    return check
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware, so streaming responses pass straight through."""
+
+    def __init__(self, app, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.enabled = enabled
+        self.in_flight = 0
+        self.pool_capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+    def check(self, scope, now: float):
+        """The rejection for this request, or None to serve it."""
+        if self.in_flight >= SHED_MAX_IN_FLIGHT:
+            REJECTED.labels("in_flight").inc()
+            return reject(503, "Server is busy, please retry shortly", SHED_RETRY_AFTER)
+        if (
+            self.in_flight >= self.pool_capacity
+            and pool_wait.average * 1000 > SHED_POOL_WAIT_MS
+            and now - pool_wait.updated < POOL_WAIT_WINDOW
+        ):
+            REJECTED.labels("pool_wait").inc()
+            return reject(503, "Server is busy, please retry shortly", SHED_RETRY_AFTER)
+
+        name = rule_for(scope["method"], scope["path"])
+        limiter = limiters.get(name) or limiters["default"]
+        retry_after = limiter.take(client_address(scope), now)
+        if retry_after:
+            REJECTED.labels(name).inc()
+            return reject(429, "Too many requests, please slow down", retry_after)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        rejection = self.check(scope, time.monotonic())
+        if rejection is not None:
+            return await rejection(scope, receive, send)
+        if scope["path"] in STREAM_PATHS:
+            return await self.app(scope, receive, send)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,268 @@
+"""
+Read replica routing.
+
+Writes and everything transactional use `db.engine`, the primary. Read-only
+endpoints take their connection from `read_connection(...)`, which hands out
+a healthy replica from DATABASE_REPLICA_URLS (round-robin) or, with no
+replicas configured, the primary as before.
+
+Health: ReplicaMonitor checks every replica each REPLICA_CHECK_INTERVAL
+seconds and keeps it out of rotation while it is unreachable or has not
+replayed, within REPLICA_MAX_LAG seconds, the WAL the primary had written
+when the check started. A replica that fails to give a connection during a
+request, or whose statement fails with a connection or server error, is
+taken out at once and the read falls back to the primary: the statement is
+run again there, once, and the primary serves the rest of the request.
+
+Read-your-writes: writes mark what they changed with the same names
+cache_sync broadcasts ("catalog", or "history" for given user emails), on
+every worker. For READ_YOUR_WRITES_SECONDS afterwards the reads that name
+that data go to the primary, so a student sees the booking they just made
+and a cache refilled after an invalidation is not refilled from a replica
+that is still behind. Keep it above REPLICA_MAX_LAG.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from psycopg2.extensions import QueryCanceledError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from db import engine, replica_engines
+from metrics import DB_READS, REPLICA_UP
+
+logger = logging.getLogger("fibo.replicas")
+
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "2"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+PRIMARY_LSN_SQL = text("SELECT CAST(pg_current_wal_lsn() AS text)")
+
+# Whether the replica has replayed up to :lsn. A server that is not in
+# recovery is not replicating from us at all (two independent local
+# instances, say) and always counts as caught up.
+REPLICA_CAUGHT_UP_SQL = text("""
+    SELECT NOT pg_is_in_recovery()
+           OR COALESCE(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), false)
+""")
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.url.host or "local"
+        if engine.url.port:
+            self.name += f":{engine.url.port}"
+        # Out of rotation until the first check passes
+        self.healthy = False
+        REPLICA_UP.labels(self.name).set(0)
+
+    def set_healthy(self, healthy: bool, reason: str = ""):
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Replica %s is back in rotation", self.name)
+            else:
+                logger.warning("Replica %s taken out of rotation: %s", self.name, reason)
+        self.healthy = healthy
+        REPLICA_UP.labels(self.name).set(1 if healthy else 0)
+
+    def check(self, primary_lsn: str):
+        deadline = time.monotonic() + REPLICA_MAX_LAG
+        try:
+            with self.engine.connect() as connection:
+                while not connection.execute(REPLICA_CAUGHT_UP_SQL, {"lsn": primary_lsn}).scalar():
+                    if time.monotonic() >= deadline:
+                        self.set_healthy(False, f"more than {REPLICA_MAX_LAG:g}s behind")
+                        return
+                    time.sleep(0.1)
+        except DBAPIError as e:
+            self.set_healthy(False, f"unreachable ({e.__class__.__name__})")
+            return
+        self.set_healthy(True)
+
+
+class WriteMarks:
+    """When each name (and name + key) was last written, expiring after `window` seconds."""
+
+    # Key of a write that touched every key of a name
+    ALL = object()
+
+    def __init__(self, window: float):
+        self.window = window
+        self._lock = threading.Lock()
+        # (name, key) -> deadline, oldest first; key None means "any key"
+        self._deadlines = OrderedDict()
+
+    def mark(self, name: str, keys=None):
+        deadline = time.monotonic() + self.window
+        marks = [(name, None)] + [(name, key) for key in (keys if keys is not None else [self.ALL])]
+        with self._lock:
+            for mark in marks:
+                self._deadlines.pop(mark, None)
+                self._deadlines[mark] = deadline
+            # Deadlines share one window, so the expired ones are at the front
+            now = time.monotonic()
+            while self._deadlines:
+                mark, oldest = next(iter(self._deadlines.items()))
+                if oldest > now:
+                    break
+                del self._deadlines[mark]
+
+    def recent(self, name: str, key=None) -> bool:
+        now = time.monotonic()
+        marks = [(name, None)] if key is None else [(name, key), (name, self.ALL)]
+        with self._lock:
+            return any(self._deadlines.get(mark, 0) > now for mark in marks)
+
+
+class ReplicaRouter:
+    def __init__(self, engines, window: float = READ_YOUR_WRITES_SECONDS):
+        self.replicas = [Replica(replica_engine) for replica_engine in engines]
+        self.writes = WriteMarks(window)
+        self._turn = itertools.count()
+
+    def mark_written(self, name: str, keys=None):
+        """Send reads of `name` (or of just those `keys`) to the primary for a while."""
+        self.writes.mark(name, keys)
+
+    def pick(self, scopes):
+        """
+        A healthy replica for a read of `scopes` (names or (name, key) pairs),
+        or None when it must, or can only, go to the primary.
+        """
+        for scope in scopes:
+            name, key = scope if isinstance(scope, tuple) else (scope, None)
+            if self.writes.recent(name, key):
+                return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def check_all(self):
+        with engine.connect() as connection:
+            primary_lsn = connection.execute(PRIMARY_LSN_SQL).scalar()
+        for replica in self.replicas:
+            replica.check(primary_lsn)
+
+
+router = ReplicaRouter(replica_engines)
+
+
+class ReplicaReadConnection:
+    """
+    A replica connection that moves to the primary if a statement fails there
+    with a connection or server error (replica restarted, recovery conflict):
+    the replica is taken out of rotation and the statement run once more on
+    the primary, which serves every later statement too. Errors in the
+    statement itself, and statement timeouts, would fail again and are raised.
+    Rows already fetched from an earlier result are not re-read.
+    """
+
+    def __init__(self, replica: Replica, connection):
+        self.replica = replica
+        self.connection = connection
+        self._options = {}
+
+    def execution_options(self, **options):
+        self._options.update(options)
+        self.connection.execution_options(**options)
+        return self
+
+    def execute(self, statement, parameters=None, **kwargs):
+        if self.replica is not None:
+            try:
+                return self.connection.execute(statement, parameters, **kwargs)
+            except (OperationalError, InterfaceError) as e:
+                if isinstance(e.orig, QueryCanceledError):
+                    raise
+                self._fall_back(e)
+        return self.connection.execute(statement, parameters, **kwargs)
+
+    def _fall_back(self, error):
+        self.replica.set_healthy(False, f"read failed ({error.orig.__class__.__name__})")
+        DB_READS.labels("fallback").inc()
+        failed, self.connection, self.replica = self.connection, engine.connect(), None
+        if self._options:
+            self.connection.execution_options(**self._options)
+        failed.invalidate()
+        failed.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+@contextmanager
+def read_connection(*scopes):
+    """
+    A connection for a read-only request. `scopes` name the data it reads:
+    "catalog", "history" (any user's bookings) or ("history", email).
+    """
+    replica = router.pick(scopes)
+    if replica is not None:
+        try:
+            replica_connection = replica.engine.connect()
+        except DBAPIError as e:
+            replica.set_healthy(False, f"connect failed ({e.__class__.__name__})")
+        else:
+            DB_READS.labels("replica").inc()
+            connection = ReplicaReadConnection(replica, replica_connection)
+            try:
+                yield connection
+            finally:
+                connection.close()
+            return
+    DB_READS.labels("primary" if replica is None else "fallback").inc()
+    with engine.connect() as connection:
+        yield connection
+
+
+class ReplicaMonitor(threading.Thread):
+    def __init__(self, interval: float = REPLICA_CHECK_INTERVAL):
+        super().__init__(name="replica-monitor", daemon=True)
+        self.interval = interval
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        # First check right away: replicas serve nothing until they pass one
+        while True:
+            try:
+                router.check_all()
+            except Exception:
+                logger.exception("Replica health check failed")
+            if self._stopping.wait(self.interval):
+                break
+
+
+# The running monitor, between start_replicas() and stop_replicas()
+_monitor = None
+
+
+def start_replicas():
+    global _monitor
+    if router.replicas:
+        # Reads use the primary until the first check, so startup need not wait
+        _monitor = ReplicaMonitor()
+        _monitor.start()
+
+
+def stop_replicas():
+    global _monitor
+    monitor, _monitor = _monitor, None
+    if monitor is not None:
+        monitor.stop()
+        monitor.join(timeout=10)
+    for replica in router.replicas:
+        replica.engine.dispose()
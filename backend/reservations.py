@@ -0,0 +1,278 @@
+"""
+Time-window reservations.
+
+Every line of a Pending or Approved booking holds `quantity` units of its
+item over the booking's dates, recorded in the item_reservations ledger
+(migrations/0010) as an inclusive daterange. An item owns `total_quantity`
+units; its free quantity over a window is the total minus the peak number of
+units reserved on any single day of that window. So a kit that is out this
+week can still be booked for next week.
+
+A reservation whose due date has passed but which has not been released yet
+(the booking is not Returned) keeps holding the units through today.
+
+`items.available_quantity` stays the "free today" counter the catalog shows.
+Bookings and releases adjust it as they go, and StockSync recomputes it
+every STOCK_SYNC_INTERVAL seconds so reservations starting or ending at
+midnight are picked up.
+"""
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from cache_sync import broadcast_invalidation
+from catalog_cache import catalog_cache
+from events import publish_event, write_transaction
+
+logger = logging.getLogger("fibo.reservations")
+
+STOCK_SYNC_INTERVAL = float(os.getenv("STOCK_SYNC_INTERVAL", "600"))
+
+# A reservation's period as it holds stock: past due and unreleased means
+# held through today
+EFFECTIVE_PERIOD = """
+    CASE WHEN upper({period}) <= CURRENT_DATE
+         THEN daterange(lower({period}), CURRENT_DATE, '[]')
+         ELSE {period} END
+"""
+
+HELD_TODAY = f"({EFFECTIVE_PERIOD.format(period='r.period')}) @> CURRENT_DATE"
+
+# Reserved units per item at every day the level changes inside
+# win.period: reservations are clipped to the window and turned into +/-
+# steps at their bounds. Expects `win` and `:item_ids` from the caller.
+RESERVED_LEVELS_CTE = f"""
+    held AS (
+        SELECT r.item_id, r.quantity,
+               ({EFFECTIVE_PERIOD.format(period='r.period')}) * w.period AS span
+        FROM item_reservations r, win w
+        WHERE r.item_id = ANY(CAST(:item_ids AS integer[]))
+          AND (r.period && w.period OR upper(r.period) <= CURRENT_DATE)
+    ),
+    steps AS (
+        SELECT item_id, lower(span) AS day, quantity AS delta FROM held WHERE NOT isempty(span)
+        UNION ALL
+        SELECT item_id, upper(span), -quantity FROM held WHERE NOT isempty(span)
+    ),
+    levels AS (
+        SELECT item_id, day, CAST(SUM(SUM(delta)) OVER (PARTITION BY item_id ORDER BY day) AS integer) AS reserved
+        FROM steps
+        GROUP BY item_id, day
+    )
+"""
+
+# Serializes reservations per item. It has to be its own statement: the
+# reservation statement must take its snapshot after the locks are granted,
+# or it would not see a reservation committed while it waited.
+LOCK_ITEMS_SQL = text("""
+    SELECT item_id FROM items
+    WHERE item_id = ANY(CAST(:item_ids AS integer[]))
+    ORDER BY item_id
+    FOR UPDATE
+""")
+
+# Reserve the whole cart in one statement: every line whose item is free for
+# the booking's window gets a booking_items row and a ledger entry, and the
+# "free today" counter drops when the window holds today. Every requested item
+# comes back with a `reserved` flag and its free quantity over the window.
+RESERVE_CART_SQL = text(f"""
+    WITH requested AS (
+        SELECT item_id, quantity
+        FROM unnest(CAST(:item_ids AS integer[]), CAST(:quantities AS integer[]))
+             AS r(item_id, quantity)
+    ),
+    booked AS (
+        SELECT daterange(CAST(:pickup_date AS date), CAST(:due_date AS date), '[]') AS period
+    ),
+    win AS (
+        SELECT ({EFFECTIVE_PERIOD.format(period='period')}) AS period FROM booked
+    ),
+    {RESERVED_LEVELS_CTE},
+    free AS (
+        SELECT i.item_id, i.total_quantity - COALESCE(MAX(l.reserved), 0) AS free_quantity
+        FROM items i
+        LEFT JOIN levels l ON l.item_id = i.item_id
+        WHERE i.item_id = ANY(CAST(:item_ids AS integer[]))
+        GROUP BY i.item_id
+    ),
+    accepted AS (
+        SELECT r.item_id, r.quantity
+        FROM requested r
+        JOIN free f ON f.item_id = r.item_id
+        WHERE f.free_quantity >= r.quantity
+    ),
+    lines AS (
+        INSERT INTO booking_items (booking_id, item_id, quantity)
+        SELECT :booking_id, item_id, quantity FROM accepted
+    ),
+    ledger AS (
+        INSERT INTO item_reservations (booking_id, item_id, quantity, period)
+        SELECT :booking_id, a.item_id, a.quantity, b.period FROM accepted a, booked b
+    ),
+    today AS (
+        UPDATE items i
+        SET available_quantity = i.available_quantity - a.quantity
+        FROM accepted a, win w
+        WHERE i.item_id = a.item_id AND w.period @> CURRENT_DATE
+        RETURNING i.item_id, i.available_quantity
+    )
+    SELECT r.item_id, r.quantity, f.free_quantity,
+           (a.item_id IS NOT NULL) AS reserved,
+           t.available_quantity
+    FROM requested r
+    LEFT JOIN free f ON f.item_id = r.item_id
+    LEFT JOIN accepted a ON a.item_id = r.item_id
+    LEFT JOIN today t ON t.item_id = r.item_id
+""")
+
+AVAILABILITY_SQL = text(f"""
+    WITH win AS (
+        SELECT daterange(CAST(:start AS date), CAST(:end AS date), '[]') AS period
+    ),
+    {RESERVED_LEVELS_CTE}
+    SELECT i.item_id, i.total_quantity,
+           COALESCE(
+               json_agg(json_build_array(l.day, l.reserved) ORDER BY l.day) FILTER (WHERE l.day IS NOT NULL),
+               '[]'
+           ) AS levels
+    FROM items i
+    LEFT JOIN levels l ON l.item_id = i.item_id
+    WHERE i.item_id = ANY(CAST(:item_ids AS integer[]))
+    GROUP BY i.item_id
+    ORDER BY i.item_id
+""")
+
+# "Free today" as the ledger sees it, for items whose counter has drifted
+STOCK_DRIFT_SQL = text(f"""
+    SELECT i.item_id
+    FROM items i
+    LEFT JOIN (
+        SELECT r.item_id, SUM(r.quantity) AS quantity
+        FROM item_reservations r
+        WHERE {HELD_TODAY}
+        GROUP BY r.item_id
+    ) held ON held.item_id = i.item_id
+    WHERE i.available_quantity IS DISTINCT FROM i.total_quantity - COALESCE(held.quantity, 0)
+    ORDER BY i.item_id
+""")
+
+SYNC_STOCK_SQL = text(f"""
+    UPDATE items i
+    SET available_quantity = i.total_quantity - COALESCE((
+        SELECT SUM(r.quantity) FROM item_reservations r
+        WHERE r.item_id = i.item_id AND {HELD_TODAY}
+    ), 0)
+    WHERE i.item_id = ANY(CAST(:item_ids AS integer[]))
+    RETURNING i.item_id, i.available_quantity
+""")
+
+
+def reserve_cart(connection, booking_id: int, cart: dict, pickup_date: date, due_date: date):
+    """
+    Reserve `cart` ({item_id: quantity}) for the booking's dates, inside the
+    caller's transaction. Returns one row per item with `reserved`,
+    `free_quantity` (None for an unknown item) and the new
+    `available_quantity` when today's counter changed.
+    """
+    params = {
+        "booking_id": booking_id,
+        "item_ids": list(cart.keys()),
+        "quantities": list(cart.values()),
+        "pickup_date": pickup_date,
+        "due_date": due_date,
+    }
+    connection.execute(LOCK_ITEMS_SQL, params)
+    return connection.execute(RESERVE_CART_SQL, params).fetchall()
+
+
+def item_availability(connection, item_ids, start: date, end: date):
+    """
+    Free quantity of each item over [start, end], both inclusive: the
+    minimum over the window plus the step function as `periods`, each
+    {start, end, free_quantity} with an inclusive end.
+    """
+    rows = connection.execute(AVAILABILITY_SQL, {"item_ids": list(item_ids), "start": start, "end": end})
+    availability = []
+    for row in rows:
+        periods = []
+        day, reserved = start, 0
+        for changed_on, level in row.levels:
+            changed_on = date.fromisoformat(changed_on)
+            if changed_on > day:
+                periods.append((day, changed_on - timedelta(days=1), row.total_quantity - reserved))
+            day, reserved = changed_on, level
+        if day <= end:
+            periods.append((day, end, row.total_quantity - reserved))
+
+        # Neighbouring steps can land on the same level
+        merged = []
+        for period in periods:
+            if merged and merged[-1][2] == period[2]:
+                merged[-1] = (merged[-1][0], period[1], period[2])
+            else:
+                merged.append(period)
+        availability.append({
+            "item_id": row.item_id,
+            "total_quantity": row.total_quantity,
+            "free_quantity": min(free for _, _, free in merged),
+            "periods": [{"start": s, "end": e, "free_quantity": free} for s, e, free in merged],
+        })
+    return availability
+
+
+def sync_available_quantity():
+    """Recompute "free today" for every item whose counter drifted; returns the changed items."""
+    with write_transaction() as connection:
+        drifted = connection.execute(STOCK_DRIFT_SQL).scalars().all()
+        if not drifted:
+            return []
+        # Lock first so the recount sees every reservation committed meanwhile
+        connection.execute(LOCK_ITEMS_SQL, {"item_ids": drifted})
+        changed = [
+            {"item_id": row.item_id, "available_quantity": row.available_quantity}
+            for row in connection.execute(SYNC_STOCK_SQL, {"item_ids": drifted})
+        ]
+        publish_event(connection, "stock.changed", {"items": changed})
+        broadcast_invalidation(connection, "catalog")
+    catalog_cache.invalidate()
+    return changed
+
+
+class StockSync(threading.Thread):
+    def __init__(self, interval: float = STOCK_SYNC_INTERVAL):
+        super().__init__(name="stock-sync", daemon=True)
+        self.interval = interval
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                changed = sync_available_quantity()
+                if changed:
+                    logger.info("Synced today's stock for %d items", len(changed))
+            except Exception:
+                logger.exception("Stock sync failed")
+
+
+# The running sync, between start_stock_sync() and stop_stock_sync()
+_stock_sync = None
+
+
+def start_stock_sync():
+    global _stock_sync
+    _stock_sync = StockSync()
+    _stock_sync.start()
+
+
+def stop_stock_sync():
+    global _stock_sync
+    stock_sync, _stock_sync = _stock_sync, None
+    if stock_sync is not None:
+        stock_sync.stop()
+        stock_sync.join(timeout=10)
@@ -0,0 +1,58 @@
+"""
+JSON encoding for API responses.
+
+The hot read endpoints (/items, /items/search, /my-bookings, /admin/bookings)
+never build Python objects for their rows: Postgres renders each row as JSON
+text (`json_select`), and `json_array` / `json_page` splice those texts into
+the response body as they are.
+
+FastJSONResponse, the app's default response class, encodes with orjson
+instead of json.dumps. FastAPI still runs jsonable_encoder over whatever an
+endpoint returns before it gets there, so the endpoints returning many rows
+(analytics, availability) return a FastJSONResponse themselves: orjson then
+walks the rows once, Decimals and dates included.
+"""
+from collections.abc import Mapping
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _encode_extra(value):
+    # Types orjson does not know, encoded the way jsonable_encoder does
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_encode_extra, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_array(texts) -> bytes:
+    """A JSON array from rows that are already JSON text."""
+    return ("[" + ",".join(texts) + "]").encode()
+
+
+def json_page(key: str, texts, next_cursor) -> bytes:
+    """A keyset page, {"<key>": [...], "next_cursor": ...}, from JSON text rows."""
+    return b'{"' + key.encode() + b'":' + json_array(texts) + b',"next_cursor":' + dumps(next_cursor) + b"}"
+
+
+def json_select(columns) -> str:
+    """
+    SQL rendering each row as compact JSON text with `columns` (trusted
+    names) as keys, in order. row_to_json over a one-row subselect is both
+    faster and tighter than json_build_object, which pads every key with spaces.
+    """
+    return f"(SELECT row_to_json(r) FROM (SELECT {', '.join(columns)}) r)::text"
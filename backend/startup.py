@@ -0,0 +1,192 @@
+"""
+Startup warm-up, liveness and readiness.
+
+After a cold start (Render's free tier scales to zero) the first requests
+used to pay for everything at once: TCP and TLS to Neon for every new pooled
+connection, Postgres loading its catalog caches on each of them, and the
+first catalog render. The warm-up does that work in the background as soon
+as the app starts:
+
+- opens WARMUP_CONNECTIONS pooled connections at the same time (capped at
+  DB_POOL_SIZE, since overflow connections are closed when returned), also
+  for each read replica, and runs the queries registered with
+  `register_warmup(..., per_connection=True)` on every one of them
+- then runs the one-off warm-ups: the default catalog page and the image
+  storage client
+
+The lifespan waits up to WARMUP_WAIT seconds for the warm-up before the
+server accepts requests, then lets it carry on in the background. A
+database that cannot be reached is retried with backoff. Only the primary
+pool has to warm up for the app to be ready: replica and one-off failures
+are logged, and those steps happen on first use instead.
+
+GET /healthz (liveness) answers as long as the process does. GET /readyz
+(readiness) answers 503 until the warm-up is done, with its progress.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import DATABASE_URL, DB_POOL_SIZE, DB_POOL_TIMEOUT, engine, replica_engines
+
+logger = logging.getLogger("fibo.startup")
+
+# false skips the warm-up: ready at once, everything warms on first use
+WARMUP = os.getenv("WARMUP", "true").lower() == "true"
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(DB_POOL_SIZE)))
+WARMUP_WAIT = float(os.getenv("WARMUP_WAIT", "15"))
+# Longest pause between attempts while the database cannot be reached
+WARMUP_MAX_RETRY_INTERVAL = 30
+
+STARTED_AT = time.monotonic()
+
+# function(connection), run on every warmed connection
+_connection_warmups = []
+# (name, function()), run once after the pools are warm
+_warmups = []
+
+
+def register_warmup(function, name: str = None, per_connection: bool = False):
+    if per_connection:
+        _connection_warmups.append(function)
+    else:
+        _warmups.append((name or function.__name__, function))
+
+
+def require_database_url():
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL is not set; put it in backend/.env or the environment")
+
+
+def warm_pool(pool_engine, count: int) -> int:
+    """Open `count` connections of `pool_engine` at once and warm each; returns how many."""
+    count = min(count, pool_engine.pool.size())
+    if count <= 0:
+        return 0
+    # Hold every connection until all are open, so each of them is a new one
+    opened = threading.Barrier(count, timeout=DB_POOL_TIMEOUT)
+
+    def warm_one(_):
+        try:
+            with pool_engine.connect() as connection:
+                opened.wait()
+                for function in _connection_warmups:
+                    function(connection)
+        except Exception:
+            opened.abort()
+            raise
+
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="warmup") as executor:
+        list(executor.map(warm_one, range(count)))
+    return count
+
+
+class Warmup(threading.Thread):
+    def __init__(self, connections: int = WARMUP_CONNECTIONS):
+        super().__init__(name="warmup", daemon=True)
+        self.connections = connections
+        self.state = "pending"
+        self.error = None
+        self.attempts = 0
+        # Step name -> milliseconds
+        self.steps = {}
+        self.finished_at = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stopping.set()
+
+    def _step(self, name: str, function, required: bool = False):
+        started = time.perf_counter()
+        try:
+            function()
+        except Exception as e:
+            if required:
+                raise
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            return
+        self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def run(self):
+        self.state = "warming"
+        retry_interval = 1
+        while WARMUP:
+            self.attempts += 1
+            try:
+                self._step("pool", lambda: warm_pool(engine, self.connections), required=True)
+                break
+            except Exception as e:
+                self.error = f"{e.__class__.__name__}: {e}"
+                logger.warning("Pool warm-up failed, retrying in %ss: %s", retry_interval, self.error)
+                if self._stopping.wait(retry_interval):
+                    return
+                retry_interval = min(retry_interval * 2, WARMUP_MAX_RETRY_INTERVAL)
+        self.error = None
+
+        if WARMUP:
+            # Best effort from here on
+            for n, replica_engine in enumerate(replica_engines):
+                self._step(f"replica_pool_{n}", lambda: warm_pool(replica_engine, self.connections))
+            for name, function in _warmups:
+                if self._stopping.is_set():
+                    return
+                self._step(name, function)
+            logger.info(
+                "Warm-up done in %.0f ms: %s",
+                (time.monotonic() - STARTED_AT) * 1000,
+                ", ".join(f"{name} {ms:g} ms" for name, ms in self.steps.items())
+            )
+        self.finished_at = time.monotonic()
+        self.state = "ready"
+        self._ready.set()
+
+    def report(self) -> dict:
+        return {
+            "status": self.state,
+            "uptime_seconds": round(time.monotonic() - STARTED_AT, 1),
+            "ready_after_seconds": round(self.finished_at - STARTED_AT, 3) if self.finished_at else None,
+            "attempts": self.attempts,
+            "steps_ms": dict(self.steps),
+            "pool": {"checked_in": engine.pool.checkedin(), "checked_out": engine.pool.checkedout()},
+            "error": self.error,
+        }
+
+
+# The warm-up of the running app, between start_warmup() and stop_warmup()
+_warmup = None
+
+
+def warmup_status():
+    """(ready, report) for GET /readyz."""
+    warmup = _warmup
+    if warmup is None:
+        return False, {"status": "stopped"}
+    return warmup.ready, warmup.report()
+
+
+async def start_warmup():
+    global _warmup
+    _warmup = Warmup()
+    _warmup.start()
+    if WARMUP_WAIT > 0:
+        # Accept requests once warm, or after WARMUP_WAIT anyway
+        await asyncio.to_thread(_warmup.wait, WARMUP_WAIT)
+
+
+def stop_warmup():
+    global _warmup
+    warmup, _warmup = _warmup, None
+    if warmup is not None:
+        warmup.stop()
+        warmup.join(timeout=10)
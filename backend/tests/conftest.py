@@ -0,0 +1,12 @@
+import os
+import sys
+
+# The backend modules are flat files next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that need Postgres run against TEST_DATABASE_URL, a migrated database
+# they may write to, and are skipped without it. Set before db.py is imported
+# so the app's engine points there and never at the DATABASE_URL from .env
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
@@ -0,0 +1,75 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="needs TEST_DATABASE_URL")
+
+STOCK = 5
+WORKERS = 30
+EMAIL = "concurrency-test@example.com"
+
+
+@pytest.fixture
+def scarce_item():
+    import main
+
+    with main.engine.begin() as connection:
+        # Resolve the user up front so only the stock path is contended
+        main.get_or_create_user(connection, EMAIL, "Concurrency Test")
+        item_id = connection.execute(text("""
+            INSERT INTO items (name, category, description, total_quantity, available_quantity, specifications)
+            VALUES ('Concurrency Test Kit', 'Test', 'Created by test_booking_concurrency.py', :qty, :qty, '{}')
+            RETURNING item_id
+        """), {"qty": STOCK}).scalar()
+    yield item_id
+    with main.engine.begin() as connection:
+        booking_ids = connection.execute(text(
+            "SELECT DISTINCT booking_id FROM booking_items WHERE item_id = :id"), {"id": item_id}).scalars().all()
+        connection.execute(text("DELETE FROM item_reservations WHERE item_id = :id"), {"id": item_id})
+        connection.execute(text("DELETE FROM booking_items WHERE item_id = :id"), {"id": item_id})
+        connection.execute(text("DELETE FROM bookings WHERE booking_id = ANY(:ids)"), {"ids": booking_ids})
+        connection.execute(text("DELETE FROM items WHERE item_id = :id"), {"id": item_id})
+
+
+def test_parallel_bookings_never_oversell(scarce_item):
+    import main
+    from main import BookingItemRequest, BookingRequest
+
+    request = BookingRequest(
+        user_email=EMAIL,
+        user_name="Concurrency Test",
+        # Starting today, so every reservation also takes from today's stock
+        pickup_date=date.today(),
+        due_date=date.today() + timedelta(days=7),
+        purpose="concurrency test",
+        items=[BookingItemRequest(item_id=scarce_item, quantity=1)],
+    )
+    barrier = threading.Barrier(WORKERS)
+
+    def checkout(_):
+        barrier.wait()
+        try:
+            return main.create_booking(request)["booking_id"]
+        except HTTPException as e:
+            assert e.status_code == 400
+            return None
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        outcomes = list(pool.map(checkout, range(WORKERS)))
+
+    with main.engine.connect() as connection:
+        available = connection.execute(text(
+            "SELECT available_quantity FROM items WHERE item_id = :id"), {"id": scarce_item}).scalar()
+        booked = connection.execute(text(
+            "SELECT COALESCE(SUM(quantity), 0) FROM booking_items WHERE item_id = :id"), {"id": scarce_item}).scalar()
+
+    successes = [booking_id for booking_id in outcomes if booking_id is not None]
+    assert available >= 0
+    assert len(successes) == STOCK
+    assert booked == STOCK
+    assert available == 0
@@ -0,0 +1,24 @@
+from booking_transitions import BOOKING_STATUSES, BOOKING_TRANSITIONS, RESTOCK_STATUSES, allowed_sources
+
+
+def test_transitions_only_name_known_statuses():
+    for targets in BOOKING_TRANSITIONS.values():
+        assert targets <= BOOKING_STATUSES
+
+
+def test_restock_statuses_are_terminal():
+    # Stock is returned once per booking only because nothing leaves these
+    for status in RESTOCK_STATUSES:
+        assert BOOKING_TRANSITIONS[status] == set()
+
+
+def test_only_pending_bookings_can_be_rejected():
+    # Approved and Overdue loans have their items out; they restock on Returned
+    assert allowed_sources("Rejected") == ["Pending"]
+
+
+def test_allowed_sources():
+    assert allowed_sources("Approved") == ["Pending"]
+    assert allowed_sources("Overdue") == ["Approved"]
+    assert allowed_sources("Returned") == ["Approved", "Overdue"]
+    assert allowed_sources("Pending") == []
@@ -0,0 +1,86 @@
+import pytest
+
+from bulk_import import SKU_MAX_LENGTH, detect_format, find_duplicates, normalize_row
+
+
+def test_normalize_row_fills_defaults():
+    assert normalize_row({"name": " Servo ", "quantity": "4"}) == {
+        "item_id": None,
+        "sku": None,
+        "name": "Servo",
+        "category": "General",
+        "description": "",
+        "quantity": 4,
+        "specifications": {"unit": "pcs"},
+        "image": None,
+    }
+
+
+def test_normalize_row_collects_specifications():
+    row = normalize_row({
+        "name": "Motor",
+        "item_id": "12",
+        "sku": " MOT-12 ",
+        "specifications": '{"voltage": "12V"}',
+        "spec.rpm": "500",
+        "spec.empty": "",
+        "unit": "box",
+    })
+    assert row["item_id"] == 12
+    assert row["sku"] == "MOT-12"
+    assert row["specifications"] == {"voltage": "12V", "rpm": "500", "unit": "box"}
+
+
+def test_normalize_row_accepts_json_numbers():
+    row = normalize_row({"name": "Motor", "quantity": 3.0, "item_id": 7, "sku": 1042})
+    assert (row["quantity"], row["item_id"], row["sku"]) == (3, 7, "1042")
+
+
+@pytest.mark.parametrize("raw, error", [
+    ([], "row must be an object"),
+    ({"name": " "}, "name is required"),
+    ({"name": "x", "quantity": "lots"}, "quantity must be an integer"),
+    ({"name": "x", "quantity": -1}, "quantity cannot be negative"),
+    ({"name": "x", "item_id": "abc"}, "item_id must be an integer"),
+    ({"name": "x", "sku": "s" * (SKU_MAX_LENGTH + 1)}, "sku is limited"),
+    ({"name": "x", "specifications": "{not json"}, "specifications must be a JSON object"),
+    ({"name": "x", "specifications": "[1]"}, "specifications must be a JSON object"),
+    ({"name": 5}, "name must be a string"),
+    ({"name": "x", "category": ["Tools"]}, "category must be a string"),
+    ({"name": "x", "image": {"file": "a.png"}}, "image must be a string"),
+    ({"name": "x", "sku": {"id": 1}}, "sku must be a string"),
+    ({"name": "x", "quantity": 2.7}, "quantity must be an integer"),
+    ({"name": "x", "quantity": True}, "quantity must be an integer"),
+    ({"name": "x", "item_id": 4.5}, "item_id must be an integer"),
+    ({"name": "x", None: ["extra cell"]}, "more columns than the header"),
+])
+def test_normalize_row_rejects(raw, error):
+    with pytest.raises(ValueError, match=error):
+        normalize_row(raw)
+
+
+def test_find_duplicates_keeps_the_first_row():
+    rows = [
+        {"row_no": 1, "item_id": 5, "sku": None},
+        {"row_no": 2, "item_id": None, "sku": "A"},
+        {"row_no": 3, "item_id": 5, "sku": "B"},
+        {"row_no": 4, "item_id": None, "sku": "A"},
+        {"row_no": 5, "item_id": None, "sku": None},
+        {"row_no": 6, "item_id": None, "sku": None},
+    ]
+    assert find_duplicates(rows) == {
+        3: "duplicate of row 1 (same item_id)",
+        4: "duplicate of row 2 (same sku)",
+    }
+
+
+@pytest.mark.parametrize("filename, declared, expected", [
+    ("items.csv", None, "csv"),
+    ("items.JSONL", None, "ndjson"),
+    ("items.json", None, "json"),
+    ("items.txt", None, "csv"),
+    (None, None, "csv"),
+    ("items.csv", "NDJSON", "ndjson"),
+])
+def test_detect_format(filename, declared, expected):
+    assert detect_format(filename, declared) == expected
@@ -0,0 +1,50 @@
+import pytest
+
+from catalog_cache import CatalogCache, etag_matches, make_etag
+
+
+def test_catalog_cache_hit_returns_body_and_etag():
+    cache = CatalogCache()
+    body, etag = cache.put("items", cache.version, b"[]")
+    assert cache.get("items") == (b"[]", make_etag(b"[]"))
+    assert etag == make_etag(b"[]")
+
+
+def test_catalog_cache_invalidate_empties_and_bumps_version():
+    cache = CatalogCache()
+    version = cache.version
+    cache.put("items", version, b"[]")
+    cache.invalidate()
+    assert cache.get("items") is None
+    assert cache.version == version + 1
+
+
+def test_catalog_cache_refuses_results_read_before_a_write():
+    cache = CatalogCache()
+    version = cache.version
+    cache.invalidate()
+    # Still hands the entry back so the response can be sent
+    assert cache.put("items", version, b"stale") == (b"stale", make_etag(b"stale"))
+    assert cache.get("items") is None
+
+
+def test_catalog_cache_stops_storing_when_full():
+    cache = CatalogCache(max_entries=1)
+    cache.put("a", cache.version, b"a")
+    cache.put("b", cache.version, b"b")
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ('"xyz"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
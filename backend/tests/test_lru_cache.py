@@ -0,0 +1,66 @@
+from main import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_lru_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("main.time.monotonic", lambda: now[0])
+    cache = LRUCache(2, ttl=5)
+    cache.put("a", 1)
+    now[0] = 104.0
+    assert cache.get("a") == 1
+    now[0] = 106.0
+    assert cache.get("a") is None
+
+
+def test_lru_put_refuses_a_key_deleted_since_its_generation():
+    cache = LRUCache(4)
+    generation = cache.generation("a")
+    cache.delete("a")
+    assert cache.put("a", "stale", generation) is False
+    assert cache.get("a") is None
+    assert cache.put("a", "fresh", cache.generation("a")) is True
+    assert cache.get("a") == "fresh"
+
+
+def test_lru_delete_of_another_key_does_not_block_put():
+    cache = LRUCache(4)
+    generation = cache.generation("a")
+    cache.delete("b")
+    assert cache.put("a", 1, generation) is True
+
+
+def test_lru_put_without_generation_always_stores():
+    cache = LRUCache(4)
+    cache.delete("a")
+    assert cache.put("a", 1) is True
+
+
+def test_lru_forgotten_deletes_still_block_older_generations():
+    cache = LRUCache(2)
+    generation = cache.generation("a")
+    cache.delete("a")
+    # Push the delete of "a" out of the bounded delete log
+    cache.delete("b")
+    cache.delete("c")
+    assert "a" not in cache._deleted
+    assert cache.put("a", "stale", generation) is False
+    assert cache.put("a", "fresh", cache.generation("a")) is True
+
+
+def test_lru_clear_blocks_every_older_generation():
+    cache = LRUCache(4)
+    generation = cache.generation("a")
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.put("a", "stale", generation) is False
+    assert cache.put("a", "fresh", cache.generation("a")) is True
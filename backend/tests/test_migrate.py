@@ -0,0 +1,71 @@
+import pytest
+
+from migrate import MIGRATIONS_DIR, Migration, changed_migrations, load_migrations
+
+
+def write_migration(tmp_path, name, sql):
+    path = tmp_path / name
+    path.write_text(sql, encoding="utf-8")
+    return Migration(str(path))
+
+
+def test_migration_reads_version_name_and_mode(tmp_path):
+    migration = write_migration(tmp_path, "0042_add_things.sql", "CREATE TABLE t (id int);\n")
+    assert (migration.version, migration.name) == ("0042", "add_things")
+    assert migration.transactional
+    assert not write_migration(tmp_path, "0043_idx.sql", "-- migrate: no-transaction\nSELECT 1;\n").transactional
+
+
+def test_migration_statements_skip_comments_and_split_on_semicolons(tmp_path):
+    migration = write_migration(tmp_path, "0001_idx.sql", """-- migrate: no-transaction
+-- Explains the index
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a
+    ON a (x);
+-- The other one
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y);
+SELECT 1
+""")
+    assert list(migration.statements()) == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a\n    ON a (x);",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON b (y);",
+        "SELECT 1",
+    ]
+
+
+def test_migration_index_names(tmp_path):
+    migration = write_migration(tmp_path, "0001_idx.sql", """
+create unique index if not exists idx_unique on a (x);
+CREATE INDEX CONCURRENTLY idx_plain ON b (y);
+CREATE TABLE c (id int);
+""")
+    assert migration.index_names() == ["idx_unique", "idx_plain"]
+
+
+def test_load_migrations_is_ordered_and_rejects_duplicate_versions(tmp_path):
+    (tmp_path / "0002_b.sql").write_text("SELECT 2;")
+    (tmp_path / "0001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "notes.txt").write_text("ignored")
+    assert [m.version for m in load_migrations(str(tmp_path))] == ["0001", "0002"]
+
+    (tmp_path / "0002_c.sql").write_text("SELECT 3;")
+    with pytest.raises(SystemExit, match="0002"):
+        load_migrations(str(tmp_path))
+
+
+def test_changed_migrations(tmp_path):
+    first = write_migration(tmp_path, "0001_a.sql", "SELECT 1;")
+    second = write_migration(tmp_path, "0002_b.sql", "SELECT 2;")
+    third = write_migration(tmp_path, "0003_c.sql", "SELECT 3;")
+    applied = {"0001": first.checksum, "0002": "checksum of an older 0002"}
+    # Pending migrations are not "changed"
+    assert changed_migrations([first, second, third], applied) == [second]
+
+
+def test_repo_migrations_load():
+    migrations = load_migrations(MIGRATIONS_DIR)
+    assert [m.version for m in migrations] == sorted(m.version for m in migrations)
+    for migration in migrations:
+        if not migration.transactional:
+            assert migration.index_names()
+            assert all(statement.rstrip().endswith(";") for statement in migration.statements())
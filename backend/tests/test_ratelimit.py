@@ -0,0 +1,157 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from ratelimit import (
+    DEFAULT_RATE_LIMITS,
+    TokenBucketLimiter,
+    client_address,
+    limit_per_user,
+    parse_rate_limits,
+    rule_for,
+    user_limiters,
+)
+
+
+def scope_with(client="10.0.0.1", forwarded=()):
+    return {
+        "client": (client, 50000) if client else None,
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+    }
+
+
+# --- TokenBucketLimiter ---
+
+def test_burst_then_rate():
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    assert [limiter.take("a", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.take("a", 0.0) == pytest.approx(0.5)
+    # Half a second later one token has come back
+    assert limiter.take("a", 0.5) == 0.0
+    assert limiter.take("a", 0.5) == pytest.approx(0.5)
+
+
+def test_refill_stops_at_burst():
+    limiter = TokenBucketLimiter(rate=1, burst=2)
+    limiter.take("a", 0.0)
+    assert [limiter.take("a", 100.0) for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_clients_have_their_own_buckets():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    assert limiter.take("a", 0.0) == 0.0
+    assert limiter.take("a", 0.0) > 0
+    assert limiter.take("b", 0.0) == 0.0
+
+
+def test_prune_drops_refilled_buckets_only():
+    limiter = TokenBucketLimiter(rate=1, burst=2, max_clients=2)
+    limiter.take("idle", 0.0)
+    limiter.take("busy", 9.0)
+    limiter.take("busy", 9.0)
+    # "idle" has been full again since t=2; "busy" is still empty at t=10
+    limiter.take("new", 10.0)
+    assert set(limiter._buckets) == {"busy", "new"}
+    assert limiter.take("busy", 10.0) == 0.0
+    assert limiter.take("busy", 10.0) > 0
+
+
+def test_prune_starts_over_when_every_client_is_active():
+    limiter = TokenBucketLimiter(rate=1, burst=10, max_clients=2)
+    limiter.take("a", 0.0)
+    limiter.take("b", 0.0)
+    limiter.take("c", 1.0)
+    assert set(limiter._buckets) == {"c"}
+
+
+# --- parse_rate_limits ---
+
+def test_parse_rate_limits_overrides_defaults():
+    limits = parse_rate_limits(" booking=20/100, catalog = 0.5/3 ,")
+    assert limits["booking"] == (20.0, 100.0)
+    assert limits["catalog"] == (0.5, 3.0)
+    assert limits["admin"] == DEFAULT_RATE_LIMITS["admin"]
+
+
+def test_parse_rate_limits_empty_spec_keeps_defaults():
+    assert parse_rate_limits("", {"history": (5, 20)}) == {"history": (5, 20)}
+
+
+@pytest.mark.parametrize("spec", ["booking", "booking=20", "booking=a/b", "booking=0/10", "booking=5/0.5"])
+def test_parse_rate_limits_rejects_bad_entries(spec):
+    with pytest.raises(ValueError, match="Bad RATE_LIMITS entry"):
+        parse_rate_limits(spec)
+
+
+# --- rule_for ---
+
+@pytest.mark.parametrize("method, path, group", [
+    ("GET", "/admin/bookings/export", "export"),
+    ("GET", "/admin/bookings", "admin"),
+    ("GET", "/my-bookings", "history"),
+    ("POST", "/bookings", "booking"),
+    ("PATCH", "/bookings/3/status", "admin"),
+    ("GET", "/items/search", "catalog"),
+    ("POST", "/items", "admin"),
+    ("GET", "/events", "events"),
+    ("GET", "/anything-else", "default"),
+])
+def test_rule_for(method, path, group):
+    assert rule_for(method, path) == group
+
+
+# --- client_address ---
+
+def test_client_address_ignores_forwarded_for_without_trusted_hops():
+    assert client_address(scope_with(forwarded=["1.1.1.1"]), trusted_hops=0) == "10.0.0.1"
+
+
+def test_client_address_takes_the_entry_of_the_outermost_trusted_proxy():
+    scope = scope_with(forwarded=["6.6.6.6, 1.1.1.1", "2.2.2.2"])
+    assert client_address(scope, trusted_hops=1) == "2.2.2.2"
+    assert client_address(scope, trusted_hops=2) == "1.1.1.1"
+    # More hops than entries: the first entry is the best we have
+    assert client_address(scope, trusted_hops=5) == "6.6.6.6"
+
+
+def test_client_address_without_header_or_peer():
+    assert client_address(scope_with(), trusted_hops=1) == "10.0.0.1"
+    assert client_address(scope_with(client=None)) == "unknown"
+
+
+# --- limit_per_user ---
+
+@pytest.fixture
+def booking_limiter(monkeypatch):
+    monkeypatch.setitem(user_limiters, "booking", TokenBucketLimiter(rate=0.001, burst=2))
+    app = FastAPI()
+
+    @app.post("/bookings", dependencies=[Depends(limit_per_user("booking", enabled=True))])
+    def create_booking(payload: dict):
+        return {"ok": True}
+
+    @app.get("/my-bookings", dependencies=[Depends(limit_per_user("booking", enabled=True))])
+    def my_bookings(email: str = ""):
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_limit_per_user_counts_each_email(booking_limiter):
+    statuses = [
+        booking_limiter.post("/bookings", json={"user_email": "a@example.com"}).status_code for _ in range(3)
+    ]
+    assert statuses == [200, 200, 429]
+    assert booking_limiter.post("/bookings", json={"user_email": "b@example.com"}).status_code == 200
+
+
+def test_limit_per_user_normalizes_the_email(booking_limiter):
+    booking_limiter.get("/my-bookings", params={"email": "A@Example.com "})
+    booking_limiter.post("/bookings", json={"user_email": "a@example.com"})
+    response = booking_limiter.get("/my-bookings", params={"email": "a@EXAMPLE.com"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_limit_per_user_lets_anonymous_requests_through(booking_limiter):
+    assert all(booking_limiter.get("/my-bookings").status_code == 200 for _ in range(5))
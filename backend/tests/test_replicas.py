@@ -0,0 +1,51 @@
+import pytest
+
+from replicas import WriteMarks
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("replicas.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_write_marks_expire_after_the_window(clock):
+    marks = WriteMarks(window=5)
+    marks.mark("bookings")
+    assert marks.recent("bookings")
+    clock[0] += 5
+    assert not marks.recent("bookings")
+
+
+def test_write_marks_per_key(clock):
+    marks = WriteMarks(window=5)
+    marks.mark("my_bookings", keys=["a@example.com"])
+    assert marks.recent("my_bookings", "a@example.com")
+    assert not marks.recent("my_bookings", "b@example.com")
+    # Any key of the name counts for a read of the whole name
+    assert marks.recent("my_bookings")
+    assert not marks.recent("items")
+
+
+def test_write_marks_without_keys_cover_every_key(clock):
+    marks = WriteMarks(window=5)
+    marks.mark("my_bookings")
+    assert marks.recent("my_bookings", "anyone@example.com")
+
+
+def test_write_marks_drop_expired_entries(clock):
+    marks = WriteMarks(window=5)
+    marks.mark("items", keys=[1, 2])
+    clock[0] += 10
+    marks.mark("bookings")
+    assert set(marks._deadlines) == {("bookings", None), ("bookings", WriteMarks.ALL)}
+
+
+def test_write_marks_remark_extends_the_deadline(clock):
+    marks = WriteMarks(window=5)
+    marks.mark("items", keys=[1])
+    clock[0] += 4
+    marks.mark("items", keys=[1])
+    clock[0] += 4
+    assert marks.recent("items", 1)
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from main import build_spec_conditions
+
+
+def test_equality_filters_use_containment():
+    conditions, params = build_spec_conditions(["voltage = 12V", "color!=red"])
+    assert conditions == [
+        "specifications @> CAST(:spec_0 AS jsonb)",
+        "NOT (specifications @> CAST(:spec_1 AS jsonb))",
+    ]
+    assert json.loads(params["spec_0"]) == {"voltage": "12V"}
+    assert json.loads(params["spec_1"]) == {"color": "red"}
+
+
+def test_numeric_filters_check_the_key_first():
+    conditions, params = build_spec_conditions(["rpm>=500"])
+    assert conditions[0].startswith("specifications ? :spec_key_0 AND ")
+    assert conditions[0].endswith(" >= :spec_0")
+    assert params == {"spec_key_0": "rpm", "spec_0": 500.0}
+
+
+@pytest.mark.parametrize("spec, detail", [
+    ("voltage", "Invalid spec filter"),
+    ("rpm>fast", "needs a number"),
+])
+def test_bad_filters_are_400(spec, detail):
+    with pytest.raises(HTTPException) as error:
+        build_spec_conditions([spec])
+    assert error.value.status_code == 400
+    assert detail in error.value.detail
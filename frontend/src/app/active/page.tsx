@@ -32,8 +32,8 @@ const API_URL = process.env.NEXT_PUBLIC_API_URL;
 /**
  * ActiveLoansPage Component
  * * Displays a list of equipment currently borrowed by the authenticated user.
- * It filters bookings to show only those with an "Approved" status, 
- * indicating the items are currently in possession of the user.
+ * Only bookings with an "Approved" or "Overdue" status are requested, i.e.
+ * the items currently in possession of the user.
  */
 export default function ActiveLoansPage() {
   // Retrieve the current user session
@@ -53,23 +53,21 @@ export default function ActiveLoansPage() {
       if (!session?.user?.email) return;
 
       try {
-        const res = await fetch(`${API_URL}/my-bookings?email=${session.user.email}`);
+        /**
+         * Active Loans are the "Approved" and "Overdue" bookings (items
+         * currently with the student); the API filters them, so Pending and Returned history
+         * is never downloaded here.
+         */
+        const res = await fetch(
+          `${API_URL}/my-bookings?email=${encodeURIComponent(session.user.email)}&status=Approved,Overdue`
+        );
         
         if (!res.ok) {
             throw new Error("Failed to fetch data");
         }
 
-        const data = await res.json();
-        
-        /**
-         * Filter logic to isolate Active Loans:
-         * - "Pending": Request made but items not picked up.
-         * - "Approved": Items currently with the student (Active).
-         * - "Returned": Transaction completed.
-         */
-        const active = data.filter((b: Booking) => b.status === "Approved");
-        
-        setActiveLoans(active);
+        const data: Booking[] = await res.json();
+        setActiveLoans(data);
       } catch (error) {
         console.error("Error fetching active loans:", error);
       } finally {
@@ -8,6 +8,7 @@ import { Toaster, toast } from "react-hot-toast";
 import AddItemModal from "@/components/AddItemModal";
 import EditItemModal from "@/components/EditItemModal";
 import { Item, AdminBooking } from "@/types";
+import { subscribeToEvents, applyStockLevels } from "@/services/liveEvents";
 
 /**
  * Base API endpoint retrieved from environment variables.
@@ -72,8 +73,8 @@ export default function AdminDashboard() {
    * to reduce total network wait time.
    * * Wrapped in useCallback to ensure referential stability for dependency arrays.
    */
-  const fetchData = useCallback(async () => {
-    setLoading(true);
+  const fetchData = useCallback(async (showLoading: boolean = true) => {
+    if (showLoading) setLoading(true);
     try {
       const [bookingsRes, itemsRes] = await Promise.all([
         fetch(`${API_URL}/admin/bookings`),
@@ -106,6 +107,26 @@ export default function AdminDashboard() {
     }
   }, [status, session, fetchData]);
 
+  /**
+   * Effect: Live Updates
+   * New requests and status changes (from any admin) refresh the tables
+   * quietly; stock changes are patched in place without a request.
+   */
+  useEffect(() => {
+    if (status !== "authenticated" || session?.user?.role !== "admin") return;
+    const refresh = () => fetchData(false);
+    return subscribeToEvents({
+      "stock.changed": ({ items: levels }) => setItems((prev) => applyStockLevels(prev, levels)),
+      "booking.created": refresh,
+      "booking.status": refresh,
+      "item.created": refresh,
+      "item.updated": refresh,
+      "item.deleted": refresh,
+      "catalog.changed": refresh,
+      resync: refresh,
+    });
+  }, [status, session, fetchData]);
+
   /**
    * Handler: Update Booking Status
    * Sends a PATCH request to modify the status of a specific booking.
@@ -175,6 +196,10 @@ export default function AdminDashboard() {
         color: "bg-blue-100 text-blue-700 border-blue-200",
         icon: <span className="w-2 h-2 rounded-full bg-blue-500 mr-2"></span>
       },
+      Overdue: {
+        color: "bg-orange-100 text-orange-700 border-orange-200",
+        icon: <span className="w-2 h-2 rounded-full bg-orange-500 mr-2"></span>
+      },
       Rejected: {
         color: "bg-red-50 text-red-600 border-red-100",
         icon: <span className="w-2 h-2 rounded-full bg-red-400 mr-2"></span>
@@ -223,7 +248,7 @@ export default function AdminDashboard() {
           </div>
           <div className="flex gap-3">
             <button
-              onClick={fetchData}
+              onClick={() => fetchData()}
               className="text-slate-500 hover:text-blue-600 p-2 rounded-full hover:bg-slate-100 transition-colors"
               title="Refresh Data"
             >
@@ -396,7 +421,7 @@ export default function AdminDashboard() {
                                     </button>
                                   </>
                                 )}
-                                {b.status === "Approved" && (
+                                {["Approved", "Overdue"].includes(b.status) && (
                                   <button
                                     onClick={() => handleStatusUpdate(b.booking_id, "Returned")}
                                     className="px-3 py-1.5 text-blue-700 bg-blue-50 rounded-lg hover:bg-blue-100 border border-blue-200 text-xs font-bold transition-colors flex items-center gap-2"
@@ -447,7 +472,7 @@ export default function AdminDashboard() {
                             <td className="px-6 py-4 font-mono text-slate-400">#{item.item_id}</td>
                             <td className="px-6 py-4">
                               <div className="w-12 h-12 bg-white rounded-lg border border-slate-200 overflow-hidden flex items-center justify-center p-1">
-                                <img src={item.image_url || "https://placehold.co/50"} alt="" className="w-full h-full object-contain" />
+                                <img src={item.image_variants?.thumb_webp || item.image_url || "https://placehold.co/50"} alt="" className="w-full h-full object-contain" />
                               </div>
                             </td>
                             <td className="px-6 py-4">
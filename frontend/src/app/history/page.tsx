@@ -30,6 +30,11 @@ interface BookingHistory {
  */
 const API_URL = process.env.NEXT_PUBLIC_API_URL;
 
+/**
+ * Bookings fetched per page; older ones load on demand.
+ */
+const PAGE_SIZE = 20;
+
 /**
  * HistoryPage Component
  * Displays a list of past booking requests for the authenticated user.
@@ -38,10 +43,27 @@ export default function HistoryPage() {
   const { data: session } = useSession();
   const [history, setHistory] = useState<BookingHistory[]>([]);
   const [loading, setLoading] = useState<boolean>(true);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
+
+  /**
+   * Fetches one page of history, newest first.
+   * @param cursor - The next_cursor of the previous page, or null for the first page.
+   */
+  const fetchHistoryPage = async (email: string, cursor: number | null) => {
+    const params = new URLSearchParams({ email, limit: String(PAGE_SIZE) });
+    if (cursor !== null) params.set("cursor", String(cursor));
+
+    const res = await fetch(`${API_URL}/my-bookings?${params}`);
+    if (!res.ok) {
+      throw new Error("Failed to fetch history data");
+    }
+    return (await res.json()) as { bookings: BookingHistory[]; next_cursor: number | null };
+  };
 
   /**
    * Effect: Fetch User History
-   * Retrieves booking history when the user session is active.
+   * Retrieves the first page of booking history when the user session is active.
    */
   useEffect(() => {
     const fetchHistory = async () => {
@@ -49,14 +71,9 @@ export default function HistoryPage() {
       if (!session?.user?.email) return;
 
       try {
-        const res = await fetch(`${API_URL}/my-bookings?email=${session.user.email}`);
-
-        if (!res.ok) {
-          throw new Error("Failed to fetch history data");
-        }
-
-        const data = await res.json();
-        setHistory(data);
+        const page = await fetchHistoryPage(session.user.email, null);
+        setHistory(page.bookings);
+        setNextCursor(page.next_cursor);
       } catch (error) {
         console.error("Error fetching history:", error);
       } finally {
@@ -67,6 +84,24 @@ export default function HistoryPage() {
     fetchHistory();
   }, [session]);
 
+  /**
+   * Appends the next page of older bookings.
+   */
+  const loadMore = async () => {
+    if (!session?.user?.email || nextCursor === null) return;
+
+    setLoadingMore(true);
+    try {
+      const page = await fetchHistoryPage(session.user.email, nextCursor);
+      setHistory((current) => [...current, ...page.bookings]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error("Error fetching history:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   /**
    * Generates a status badge with appropriate colors and icons based on the booking status.
    * @param status - The status string from the database (e.g., 'Approved', 'Rejected').
@@ -82,6 +117,15 @@ export default function HistoryPage() {
             Approved
           </span>
         );
+      case "Overdue":
+        return (
+          <span className="flex items-center gap-1 bg-orange-100 text-orange-700 px-3 py-1 rounded-full text-xs font-bold border border-orange-200">
+            <svg className="w-3 h-3" fill="none" viewBox="0 0 24 24" stroke="currentColor" strokeWidth="3">
+              <path strokeLinecap="round" strokeLinejoin="round" d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z" />
+            </svg>
+            Overdue
+          </span>
+        );
       case "Rejected":
         return (
           <span className="flex items-center gap-1 bg-red-100 text-red-700 px-3 py-1 rounded-full text-xs font-bold border border-red-200">
@@ -207,6 +251,18 @@ export default function HistoryPage() {
                 </div>
               </div>
             ))}
+
+            {nextCursor !== null && (
+              <div className="text-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-6 py-2 bg-white border border-slate-200 rounded-full text-sm font-bold text-blue-900 hover:bg-slate-100 transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </main>
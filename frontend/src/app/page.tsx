@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect, useCallback, useMemo } from "react";
+import { useState, useEffect, useCallback, useMemo, useRef } from "react";
 import { useSession, signIn } from "next-auth/react";
 import { Toaster, toast } from "react-hot-toast";
 
@@ -9,6 +9,7 @@ import ItemCard from "@/components/ItemCard";
 import CartSidebar from "@/components/CartSidebar";
 import CheckoutModal from "@/components/CheckoutModal";
 import { Item } from "@/types";
+import { subscribeToEvents, applyStockLevels } from "@/services/liveEvents";
 
 /**
  * Interface extending the base Item type to include quantities
@@ -42,6 +43,9 @@ export default function Home() {
   const [isCartOpen, setIsCartOpen] = useState<boolean>(false);
   const [isCheckoutModalOpen, setIsCheckoutModalOpen] = useState(false);
   const [isSubmitting, setIsSubmitting] = useState(false);
+  // Idempotency-Key of the checkout being submitted; reused while the same
+  // payload is retried, so a request that did go through is not booked twice
+  const checkoutKey = useRef<{ body: string; key: string } | null>(null);
 
   // --- State: Filtering & Search ---
   const [searchTerm, setSearchTerm] = useState<string>("");
@@ -74,6 +78,28 @@ export default function Home() {
     fetchItems();
   }, [fetchItems]);
 
+  /**
+   * Live Updates
+   * Stock levels pushed by the backend are patched in place (catalog and
+   * cart alike); structural catalog changes trigger a refetch, which the
+   * backend answers from its cache.
+   */
+  useEffect(() => {
+    return subscribeToEvents({
+      "stock.changed": ({ items: levels }) => {
+        setItems((prev) => applyStockLevels(prev, levels));
+        setCart((prev) => applyStockLevels(prev, levels));
+      },
+      "item.deleted": ({ item_id }) => {
+        setItems((prev) => prev.filter((item) => item.item_id !== item_id));
+      },
+      "item.created": fetchItems,
+      "item.updated": fetchItems,
+      "catalog.changed": fetchItems,
+      resync: fetchItems,
+    }, ["stock", "item", "catalog"]);
+  }, [fetchItems]);
+
   /**
    * Computed Property: Unique Categories
    * Derives a list of unique categories from the items array.
@@ -203,18 +229,36 @@ export default function Home() {
       };
 
       // 3. API Submission
+      const body = JSON.stringify(payload);
+      if (!checkoutKey.current || checkoutKey.current.body !== body) {
+        checkoutKey.current = { body, key: crypto.randomUUID() };
+      }
       const res = await fetch(`${API_URL}/bookings`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        headers: { "Content-Type": "application/json", "Idempotency-Key": checkoutKey.current.key },
+        body,
       });
 
       if (!res.ok) {
         const errorData = await res.json();
-        throw new Error(errorData.detail || "Booking failed.");
+        const detail = errorData.detail;
+        // Stock failures come back as { message, failed_items }, everything else as a string
+        if (detail && typeof detail === "object" && Array.isArray(detail.failed_items)) {
+          const lines = detail.failed_items.map(
+            (line: { item_id: number; requested: number; available: number | null }) => {
+              const name = cart.find((item) => Number(item.item_id) === line.item_id)?.name ?? `Item #${line.item_id}`;
+              return line.available === null
+                ? `${name}: no longer exists`
+                : `${name}: requested ${line.requested}, only ${line.available} available`;
+            }
+          );
+          throw new Error([detail.message, ...lines].join("\n"));
+        }
+        throw new Error(typeof detail === "string" ? detail : "Booking failed.");
       }
 
       // 4. Success Handling
+      checkoutKey.current = null;
       toast.success("Requisition submitted successfully!");
       setCart([]); // Clear cart
       setIsCartOpen(false);
@@ -223,7 +267,8 @@ export default function Home() {
 
     } catch (error: Error | unknown) {
       const message = error instanceof Error ? error.message : "An unexpected error occurred.";
-      toast.error(message);
+      // One line per unavailable item
+      toast.error(message, { style: { whiteSpace: "pre-line" } });
     } finally {
       setIsSubmitting(false);
     }
@@ -98,7 +98,7 @@ export default function CartSidebar({
                 {/* Item Image */}
                 <div className="w-16 h-16 bg-slate-50 rounded-lg flex-shrink-0 overflow-hidden border border-slate-200">
                   <img
-                    src={item.image_url || "https://placehold.co/100x100?text=No+Img"}
+                    src={item.image_variants?.thumb_webp || item.image_url || "https://placehold.co/100x100?text=No+Img"}
                     alt={item.name}
                     className="w-full h-full object-contain p-1"
                     onError={(e) => {
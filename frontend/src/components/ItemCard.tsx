@@ -18,8 +18,11 @@ interface ItemCardProps {
  */
 export default function ItemCard({ item, onAddToCart }: ItemCardProps) {
   // 1. Determine Image URL with Fallback
+  // Prefer the card-sized WebP rendition over the full-size upload
   const imageUrl =
-    item.image_url || "https://placehold.co/400x300?text=No+Image";
+    item.image_variants?.medium_webp ||
+    item.image_url ||
+    "https://placehold.co/400x300?text=No+Image";
 
   // 2. Determine Availability Status
   const isAvailable = item.available_quantity > 0;
@@ -0,0 +1,59 @@
+/**
+ * Base API URL from environment variables.
+ */
+const API_URL = process.env.NEXT_PUBLIC_API_URL || "";
+
+/**
+ * A single stock level pushed by the backend.
+ */
+export interface StockLevel {
+  item_id: number;
+  available_quantity: number;
+}
+
+/**
+ * Handlers keyed by event type (e.g. "stock.changed", "booking.created").
+ * "resync" is called when events may have been missed (reconnect or a
+ * slow client) and the page should refetch its data.
+ */
+export type LiveEventHandlers = Record<string, (data: any) => void>;
+
+/**
+ * Subscribes to the backend's Server-Sent Events stream (GET /events).
+ * The browser reconnects on its own if the stream drops.
+ * @param {LiveEventHandlers} handlers - Callbacks per event type.
+ * @param {string[]} [types] - Event type prefixes to receive, e.g. ["stock", "item"].
+ * @returns {() => void} Closes the stream.
+ */
+export const subscribeToEvents = (handlers: LiveEventHandlers, types?: string[]): (() => void) => {
+  const query = types && types.length ? `?types=${types.join(",")}` : "";
+  const source = new EventSource(`${API_URL}/events${query}`);
+
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (event) => {
+      handler(JSON.parse((event as MessageEvent).data));
+    });
+  });
+
+  // Anything published while we were disconnected is gone: refetch after a reconnect
+  let hasConnected = false;
+  source.onopen = () => {
+    if (hasConnected) handlers.resync?.({});
+    hasConnected = true;
+  };
+
+  return () => source.close();
+};
+
+/**
+ * Applies pushed stock levels to a list of items.
+ * @param {T[]} items - Current items.
+ * @param {StockLevel[]} levels - Levels from a "stock.changed" event.
+ * @returns {T[]} A new list with the quantities updated.
+ */
+export const applyStockLevels = <T extends StockLevel>(items: T[], levels: StockLevel[]): T[] => {
+  const byId = new Map(levels.map((level) => [level.item_id, level.available_quantity]));
+  return items.map((item) =>
+    byId.has(item.item_id) ? { ...item, available_quantity: byId.get(item.item_id)! } : item
+  );
+};
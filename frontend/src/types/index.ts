@@ -5,6 +5,8 @@ export interface Item {
   description?: string;
   available_quantity: number;
   image_url?: string;
+  // Resized renditions generated by the backend: thumb, medium (+ _webp)
+  image_variants?: Record<string, string>;
   specifications: Record<string, any>;
 }
 